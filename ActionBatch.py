@@ -0,0 +1,44 @@
+from base import Action
+from dataclasses import dataclass
+import numpy as np
+from typing import Iterator, Optional
+
+
+@dataclass
+class ActionInfo:
+    action: Action
+    new_board: Optional[np.ndarray] = None
+    new_features: Optional[np.ndarray] = None
+    new_Q_value: Optional[float] = None
+
+
+@dataclass
+class ActionBatch:
+    """
+    Candidate moves of one position as struct of arrays:
+    cells (rows[i], cols[i]), features[i] = [1, features after the move], Q[i] = theta . features[i]
+    """
+    rows: np.ndarray
+    cols: np.ndarray
+    features: np.ndarray
+    Q: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __iter__(self) -> Iterator[ActionInfo]:
+        """
+        Actions one by one as ActionInfo, as get_possible_actions() returned them before batching,
+        new_features are views into features
+        """
+        for i in range(len(self)):
+            yield ActionInfo(action=self.action(i), new_features=self.features[i], new_Q_value=float(self.Q[i]))
+
+    def action(self, i: int) -> Action:
+        return Action(int(self.rows[i]), int(self.cols[i]))
+
+    def best(self) -> np.ndarray:
+        """
+        Indices of all actions with max Q value
+        """
+        return np.flatnonzero(self.Q == self.Q.max())
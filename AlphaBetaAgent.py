@@ -0,0 +1,217 @@
+from base import Agent, Action, GameState, Mark, FeaturesModel, is_win_at, near_cells
+from LRUCache import LRUCache
+from ZobristHash import ZobristHash
+import numpy as np
+import logging
+import time
+from typing import List, Optional, Tuple
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class AlphaBetaAgent(Agent):
+    """
+    Negamax alpha-beta search with iterative deepening under a wall-clock budget.
+    Moves are restricted to empty cells near stones and ordered by one-ply Q value
+    of the linear model (theta . [1, features]), the same value is used at the horizon.
+    Search makes and unmakes moves in place on one board copy per move,
+    positions are stored in a transposition table keyed by Zobrist hash.
+    """
+    WIN = 1e9
+
+    def __init__(self,
+                 theta: np.ndarray,
+                 features_model: FeaturesModel,
+                 row: int = 5,
+                 time_budget: float = 1.0,
+                 max_depth: int = 6,
+                 radius: int = 2,
+                 max_candidates: Optional[int] = 15,
+                 tt_size: int = 1000000,
+                 debug: bool = False
+                 ):
+        self.theta = theta
+        self.features_model = features_model
+        self.row = row
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.radius = radius
+        self.max_candidates = max_candidates
+        self.debug = debug
+
+        self.zobrist = ZobristHash()
+        self.tt = LRUCache(tt_size)
+        self._tt_geometry: Optional[Tuple] = None
+
+        self.board: np.ndarray = np.zeros((0, 0), dtype=np.int8)
+        self.hash: int = 0
+        self.deadline: float = 0.0
+        self.nodes: int = 0
+        self.last_depth: int = 0
+        self._root_moves: Optional[Tuple[List[Tuple[int, int]], np.ndarray]] = None
+
+    def get_action(self, state: GameState) -> Action:
+        self.board = state.board.copy()
+        # hash is relative to the board, geometry of auto-extended board changes between moves
+        geometry = (self.board.shape, state.origin)
+        if geometry != self._tt_geometry:
+            self.tt.clear()
+            self._tt_geometry = geometry
+        self.hash = self.zobrist.hash_board(self.board, state.current_player)
+        self.deadline = time.perf_counter() + self.time_budget
+        self.nodes = 0
+        self.last_depth = 0
+
+        player = state.current_player
+        # root ordering counts against the budget and is reused by every iteration
+        rows, cols = near_cells(self.board, self.radius)
+        win = self.winning_move(player, rows, cols)
+        if win is not None:
+            return Action(*win)
+        self._root_moves = self.ordered_moves(player, rows, cols)
+        best = self._root_moves[0][0]
+        for depth in range(1, self.max_depth + 1):
+            try:
+                value, move = self.search(depth, -np.inf, np.inf, player, 0)
+            except SearchTimeout:
+                break
+            if move is not None:
+                best = move
+            self.last_depth = depth
+            if abs(value) >= self.WIN / 2:
+                break  # forced win or loss found
+        if self.debug:
+            logging.info(f'{self.__class__.__name__}: depth {self.last_depth}, nodes {self.nodes}, move {best}')
+        return Action(int(best[0]), int(best[1]))
+
+    def search(self, depth: int, alpha: float, beta: float, player: Mark, ply: int) -> Tuple[float, Optional[Tuple[int, int]]]:
+        """
+        Value of the position for player to move and the best move
+        """
+        # every node scores all its candidates, so the clock is cheap next to it
+        self.nodes += 1
+        self.check_deadline()
+
+        alpha_orig = alpha
+        tt_move: Optional[Tuple[int, int]] = None
+        entry = self.tt.get(self.hash)
+        if entry is not None:
+            e_depth, e_flag, e_value, tt_move = entry
+            if e_depth >= depth and ply > 0:
+                if e_flag == EXACT:
+                    return e_value, tt_move
+                if e_flag == LOWER:
+                    alpha = max(alpha, e_value)
+                elif e_flag == UPPER:
+                    beta = min(beta, e_value)
+                if alpha >= beta:
+                    return e_value, tt_move
+
+        if ply == 0 and self._root_moves is not None:
+            moves, q = list(self._root_moves[0]), self._root_moves[1]
+        else:
+            rows, cols = near_cells(self.board, self.radius)
+            # immediate win ends the search at any depth, all candidates are tried before the cut
+            win = self.winning_move(player, rows, cols)
+            if win is not None:
+                return self.WIN - ply, win
+            self.check_deadline()
+            moves, q = self.ordered_moves(player, rows, cols)
+        if len(moves) == 0:
+            return 0.0, None
+
+        if depth == 1:
+            return float(q[0]), moves[0]
+
+        if tt_move is not None and tt_move in moves:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+
+        other = Mark.O if player == Mark.X else Mark.X
+        best_value = -np.inf
+        best_move = moves[0]
+        for move in moves:
+            self.make(move, player)
+            try:
+                value, _ = self.search(depth - 1, -beta, -alpha, other, ply + 1)
+            finally:
+                self.unmake(move, player)
+            value = -value
+            if value > best_value:
+                best_value = value
+                best_move = move
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        if best_value <= alpha_orig:
+            flag = UPPER
+        elif best_value >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.tt.put(self.hash, (depth, flag, best_value, best_move))
+        return best_value, best_move
+
+    def check_deadline(self) -> None:
+        if time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+    def winning_move(self, player: Mark, rows: np.ndarray, cols: np.ndarray) -> Optional[Tuple[int, int]]:
+        for r, c in zip(rows.tolist(), cols.tolist()):
+            self.board[r, c] = player.value
+            win = is_win_at(self.board, r, c, self.row)
+            self.board[r, c] = Mark.NO.value
+            if win:
+                return (r, c)
+        return None
+
+    def make(self, move: Tuple[int, int], player: Mark) -> None:
+        """
+        Places stone in place, wins are found by winning_move() before
+        """
+        r, c = move
+        self.board[r, c] = player.value
+        self.hash ^= self.zobrist.key(r, c, player.value) ^ self.zobrist.side
+
+    def unmake(self, move: Tuple[int, int], player: Mark) -> None:
+        r, c = move
+        self.board[r, c] = Mark.NO.value
+        self.hash ^= self.zobrist.key(r, c, player.value) ^ self.zobrist.side
+
+    def ordered_moves(self, player: Mark, rows: np.ndarray, cols: np.ndarray) -> Tuple[List[Tuple[int, int]], np.ndarray]:
+        """
+        Candidate moves sorted by one-ply Q value for player, best first, at most max_candidates of them
+        """
+        if len(rows) == 0:
+            return [], np.zeros(0)
+        state = GameState(self.board, player, False, Mark.NO)
+        X = np.empty((len(rows), len(self.theta)))
+        X[:, 0] = 1
+        X[:, 1:] = self.features_model.get_features_batch(state, rows, cols)
+        q = np.dot(X, self.theta)
+        order = np.argsort(-q, kind='stable')
+        if self.max_candidates is not None:
+            order = order[:self.max_candidates]
+        return [(int(rows[i]), int(cols[i])) for i in order], q[order]
+
+    def win(self, state: GameState) -> None:
+        pass
+
+    def loss(self, state: GameState) -> None:
+        pass
+
+    def draw(self, state: GameState) -> None:
+        pass
+
+    def get_learn_params(self) -> str:
+        return str(list(self.theta))
+
+    def get_learn_array(self) -> Optional[np.ndarray]:
+        return self.theta
@@ -0,0 +1,87 @@
+from base import Mark
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Tuple
+
+
+class BatchGame:
+    """
+    B independent m,n,k-games on fixed boards stored as one (B, h, w) int8 tensor.
+    step() applies one move in every game, wins and draws are detected for all games
+    at once with window sums. Rules are the same as in Game with fixed m and n:
+    X moves first, draw on full board or on the turn 200.
+    """
+    def __init__(self, batch_size: int, m: int, n: int, k: int = 5, max_turns: int = 200):
+        self.batch_size = batch_size
+        self.width = m
+        self.height = n
+        self.row = k
+        self.max_turns = max_turns
+
+        self.boards = np.full((batch_size, n, m), Mark.NO.value, dtype=np.int8)
+        self.current_player = np.full(batch_size, Mark.X.value, dtype=np.int8)
+        self.turn_no = np.zeros(batch_size, dtype=np.int32)
+        self.winner = np.full(batch_size, Mark.NO.value, dtype=np.int8)
+        self.end_game = np.zeros(batch_size, dtype=bool)
+
+    def reset(self, mask: np.ndarray = None) -> None:
+        """
+        Starts new games in place of games selected by mask (all games if mask is None)
+        """
+        if mask is None:
+            mask = np.ones(self.batch_size, dtype=bool)
+        self.boards[mask] = Mark.NO.value
+        self.current_player[mask] = Mark.X.value
+        self.turn_no[mask] = 0
+        self.winner[mask] = Mark.NO.value
+        self.end_game[mask] = False
+
+    def step(self, rows: np.ndarray, cols: np.ndarray, auto_reset: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Current player of every active game places a stone on (rows[i], cols[i]),
+        moves of already finished games are ignored.
+        Returns mask of games finished by this step and their winners (Mark values).
+        With auto_reset finished games are started again right away.
+        """
+        active = ~self.end_game
+        idx = np.nonzero(active)[0]
+        r = np.asarray(rows)[idx]
+        c = np.asarray(cols)[idx]
+        if np.any(self.boards[idx, r, c] != Mark.NO.value):
+            raise RuntimeError('Cell already used')
+        self.boards[idx, r, c] = self.current_player[idx]
+
+        won = np.zeros(self.batch_size, dtype=bool)
+        won[idx] = self.check_win(idx)
+        full = np.zeros(self.batch_size, dtype=bool)
+        full[idx] = ~np.any(self.boards[idx] == Mark.NO.value, axis=(1, 2))
+        finished = active & (won | full | (self.turn_no == self.max_turns))
+
+        self.winner[won] = self.current_player[won]
+        self.end_game |= finished
+        winners = np.where(finished, self.winner, Mark.NO.value).astype(np.int8)
+
+        going = active & ~finished
+        self.current_player[going] = Mark.X.value + Mark.O.value - self.current_player[going]
+        self.turn_no[going] += 1
+
+        if auto_reset:
+            self.reset(finished)
+        return finished, winners
+
+    def check_win(self, idx: np.ndarray) -> np.ndarray:
+        """
+        Whether current player of games idx has k in a row, by window sums in four directions
+        """
+        k = self.row
+        own = (self.boards[idx] == self.current_player[idx, None, None]).astype(np.int8)
+        won = np.zeros(len(idx), dtype=bool)
+        if own.shape[2] >= k:
+            won |= np.any(sliding_window_view(own, k, axis=2).sum(axis=3) == k, axis=(1, 2))
+        if own.shape[1] >= k:
+            won |= np.any(sliding_window_view(own, k, axis=1).sum(axis=3) == k, axis=(1, 2))
+        if own.shape[1] >= k and own.shape[2] >= k:
+            squares = sliding_window_view(own, (k, k), axis=(1, 2))
+            won |= np.any(np.einsum('bijkk->bij', squares) == k, axis=(1, 2))
+            won |= np.any(np.einsum('bijkk->bij', squares[..., ::-1]) == k, axis=(1, 2))
+        return won
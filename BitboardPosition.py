@@ -0,0 +1,118 @@
+from base import Mark
+import numpy as np
+from typing import List, Tuple
+
+
+class BitboardPosition:
+    """
+    Position stored as two arbitrary-precision integers, one bit per cell for X and O.
+    Every board row is followed by a guard column which is always empty,
+    so shifted lines don't wrap from one row to the next.
+    Cell (row, col) is bit row * (width + 1) + col.
+    """
+    def __init__(self, height: int, width: int, k: int = 5):
+        self.height = height
+        self.width = width
+        self.row = k
+        self.stride = width + 1
+        self.x: int = 0
+        self.o: int = 0
+        # shifts for directions: horizontal, diagonal, vertical, anti-diagonal
+        self.shifts: List[int] = [1, self.stride + 1, self.stride, self.stride - 1]
+        row_mask = (1 << width) - 1
+        self.full: int = 0
+        for r in range(height):
+            self.full |= row_mask << (r * self.stride)
+
+    @classmethod
+    def from_array(cls, board: np.ndarray, k: int = 5) -> 'BitboardPosition':
+        h, w = board.shape
+        pos = cls(h, w, k)
+        pos.x = pos._bits(board == Mark.X.value)
+        pos.o = pos._bits(board == Mark.O.value)
+        return pos
+
+    def _bits(self, mask: np.ndarray) -> int:
+        # pad guard column and pack row-major cells into little-endian bit order
+        padded = np.zeros((self.height, self.stride), dtype=bool)
+        padded[:, :self.width] = mask
+        return int.from_bytes(np.packbits(padded.ravel(), bitorder='little').tobytes(), 'little')
+
+    def to_array(self) -> np.ndarray:
+        board = np.full((self.height, self.width), Mark.NO.value, dtype=np.int8)
+        for bits, mark in [(self.x, Mark.X), (self.o, Mark.O)]:
+            n = self.height * self.stride
+            data = np.frombuffer(bits.to_bytes((n + 7) // 8, 'little'), dtype=np.uint8)
+            cells = np.unpackbits(data, bitorder='little')[:n].reshape(self.height, self.stride)
+            board[cells[:, :self.width] == 1] = mark.value
+        return board
+
+    def bit(self, row: int, col: int) -> int:
+        return 1 << (row * self.stride + col)
+
+    def get(self, row: int, col: int) -> Mark:
+        b = self.bit(row, col)
+        if self.x & b:
+            return Mark.X
+        if self.o & b:
+            return Mark.O
+        return Mark.NO
+
+    def place(self, row: int, col: int, mark: Mark) -> None:
+        b = self.bit(row, col)
+        if (self.x | self.o) & b:
+            raise RuntimeError('Cell already used')
+        if mark == Mark.X:
+            self.x |= b
+        elif mark == Mark.O:
+            self.o |= b
+        else:
+            raise RuntimeError('Unknown player')
+
+    def remove(self, row: int, col: int) -> None:
+        b = ~self.bit(row, col)
+        self.x &= b
+        self.o &= b
+
+    def stones(self, mark: Mark) -> int:
+        return self.x if mark == Mark.X else self.o
+
+    def is_win(self, mark: Mark) -> bool:
+        """
+        k in a row by repeated shift-and-AND: after the loop a bit is set
+        only if k consecutive cells in the direction start there
+        """
+        b = self.stones(mark)
+        for s in self.shifts:
+            run = b
+            n = 1
+            while n < self.row and run:
+                step = min(n, self.row - n)
+                run &= run >> (s * step)
+                n += step
+            if run:
+                return True
+        return False
+
+    def check_win(self) -> Mark:
+        if self.is_win(Mark.X):
+            return Mark.X
+        if self.is_win(Mark.O):
+            return Mark.O
+        return Mark.NO
+
+    def empty(self) -> int:
+        return self.full & ~(self.x | self.o)
+
+    def empty_count(self) -> int:
+        return bin(self.empty()).count('1')
+
+    def empty_cells(self) -> List[Tuple[int, int]]:
+        cells = []
+        e = self.empty()
+        while e:
+            low = e & -e
+            i = low.bit_length() - 1
+            cells.append(divmod(i, self.stride))
+            e ^= low
+        return cells
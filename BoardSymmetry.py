@@ -0,0 +1,116 @@
+from base import Mark, GameState
+from ZobristHash import ZobristHash
+import numpy as np
+from typing import List, Tuple, Optional
+
+
+class BoardSymmetry:
+    """
+    Dihedral symmetries of the board: transform t is fliplr (if t >= 4)
+    followed by t % 4 counter-clockwise rotations by 90 degrees.
+    A square board has all 8 transforms, a rectangular one only 4 of them
+    (identity, rotation by 180 degrees and two flips), which keep its shape.
+    Auto-extended boards of Game always have k empty rows/columns around the stones,
+    so they are transformed the same way.
+    """
+    def __init__(self, zobrist: Optional[ZobristHash] = None):
+        self.zobrist = zobrist if zobrist is not None else ZobristHash()
+
+    def transforms(self, shape: Tuple[int, int]) -> List[int]:
+        if shape[0] == shape[1]:
+            return list(range(8))
+        return [0, 2, 4, 6]
+
+    def inverse(self, t: int) -> int:
+        # reflections are involutions
+        if t >= 4:
+            return t
+        return (4 - t) % 4
+
+    def apply(self, board: np.ndarray, t: int) -> np.ndarray:
+        b = np.fliplr(board) if t >= 4 else board
+        return np.ascontiguousarray(np.rot90(b, t % 4))
+
+    def transform_cell(self, row, col, shape: Tuple[int, int], t: int):
+        """
+        Position of the cell (row, col) of a board with shape on the transformed board,
+        row and col may be arrays of cells
+        """
+        h, w = shape
+        if t >= 4:
+            col = w - 1 - col
+        for _ in range(t % 4):
+            row, col = w - 1 - col, row
+            h, w = w, h
+        return (row, col)
+
+    def transform_shape(self, shape: Tuple[int, int], t: int) -> Tuple[int, int]:
+        return shape if t % 2 == 0 else (shape[1], shape[0])
+
+    def canonical(self, board: np.ndarray) -> Tuple[np.ndarray, int]:
+        """
+        Canonical representative of the board (lexicographically smallest cells) and its transform
+        """
+        best: Optional[Tuple[bytes, int, np.ndarray]] = None
+        for t in self.transforms(board.shape):
+            b = self.apply(board, t)
+            key = b.astype(np.int8).tobytes()
+            if best is None or key < best[0]:
+                best = (key, t, b)
+        assert best is not None
+        return best[2], best[1]
+
+    def canonical_stack(self, boards: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        canonical() of every board of (boards x height x width) stack at once: canonical boards and their transforms
+        """
+        best = boards
+        best_t = np.zeros(len(boards), dtype=np.intp)
+        flat = boards.reshape(len(boards), -1)
+        rows = np.arange(len(boards))
+        for t in self.transforms(boards.shape[1:]):
+            if t == 0:
+                continue
+            b = boards[:, :, ::-1] if t >= 4 else boards
+            b = np.rot90(b, t % 4, axes=(1, 2))
+            candidate = b.reshape(len(boards), -1)
+            # lexicographic comparison decided by the first differing cell
+            differ = candidate != flat
+            first = differ.argmax(axis=1)
+            smaller = differ.any(axis=1) & (candidate[rows, first] < flat[rows, first])
+            if smaller.any():
+                best = np.where(smaller[:, np.newaxis, np.newaxis], b, best)
+                flat = best.reshape(len(boards), -1)
+                best_t[smaller] = t
+        return np.ascontiguousarray(best), best_t
+
+    def hashes(self, board: np.ndarray, current_player: Mark) -> List[int]:
+        """
+        Zobrist hash of the board under every transform of its shape, cells relative to the board
+        """
+        side = self.zobrist.side if current_player == Mark.O else 0
+        rows, cols = np.nonzero(board != Mark.NO.value)
+        marks = board[rows, cols]
+        result = []
+        for t in self.transforms(board.shape):
+            tr, tc = self.transform_cell(rows, cols, board.shape, t)
+            h = side
+            for m in (Mark.X.value, Mark.O.value):
+                h ^= int(np.bitwise_xor.reduce(self.zobrist.keys(tr[marks == m], tc[marks == m], m), initial=np.uint64(0)))
+            result.append(h)
+        return result
+
+    def canonical_hash(self, board: np.ndarray, current_player: Mark) -> Tuple[int, int]:
+        """
+        Smallest hash over transforms and the transform giving it
+        """
+        candidates = zip(self.hashes(board, current_player), self.transforms(board.shape))
+        return min(candidates)
+
+    def canonical_state(self, state: GameState) -> Tuple[GameState, int]:
+        """
+        State transformed by the transform of canonical_hash, its hash is the canonical hash
+        """
+        h, t = self.canonical_hash(state.board, state.current_player)
+        board = self.apply(state.board, t)
+        return GameState(board, state.current_player, state.is_game_end, state.winner, h), t
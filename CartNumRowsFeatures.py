@@ -19,6 +19,8 @@ class CartNumRowsFeatures(NumRowsFeatures):
                 if n2 == 'alone_alone':
                     continue
                 self._cart_feature_names.append(CartFeature(n1, n2))
+        # base features which take part in pairwise products
+        self._cart_index = np.array([i for i, n in enumerate(self._feature_names) if n != 'alone_alone'])
 
     def feature_names(self) -> List[Any]:
         return self._cart_feature_names
@@ -30,20 +32,32 @@ class CartNumRowsFeatures(NumRowsFeatures):
     def get_features(self, state: GameState) -> List[int]:
         #logging.info(f'{self.__class__.__name__}.get_features()')
         base_features = super().get_features(state)
-        features = base_features.copy()
         #logging.info(f'base_features: {len(base_features)} {base_features}')
+        pairs = base_features[self._cart_index]
+        return np.concatenate([base_features, np.outer(pairs, pairs).ravel()])
 
-        for i, n1 in enumerate(self._feature_names):
-            if n1 == 'alone_alone':
-                continue
-            for j, n2 in enumerate(self._feature_names):
-                if n2 == 'alone_alone':
-                    continue
-
-                val = base_features[i] * base_features[j]
-                features = np.append(features, val)
+    def cartesian(self, base_features: np.ndarray, sparse: bool = False) -> Any:
+        """
+        (candidates x base features) matrix to (candidates x features) in one step,
+        with sparse=True returns scipy.sparse.csr_matrix, most of row counts are zero
+        """
+        pairs = base_features[:, self._cart_index]
+        n = len(base_features)
+        products = (pairs[:, :, None] * pairs[:, None, :]).reshape(n, -1)
+        if sparse:
+            from scipy import sparse as sp
+            return sp.hstack([sp.csr_matrix(base_features), sp.csr_matrix(products)], format='csr')
+        return np.hstack([base_features, products])
 
-        return features
+    def get_features_batch(self, state: GameState, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        board = state.board.copy()
+        base = np.zeros((len(rows), len(self._feature_names)))
+        candidate = GameState(board, state.current_player, state.is_game_end, state.winner)
+        for i, (r, c) in enumerate(zip(rows, cols)):
+            board[r, c] = state.current_player.value
+            base[i] = super().get_features(candidate)
+            board[r, c] = Mark.NO.value
+        return self.cartesian(base)
 
 if __name__ == "__main__":
     f = CartNumRowsFeatures(5)
@@ -4,8 +4,12 @@ from typing import Callable, Optional
 
 
 class ConsoleView(View):
-    def __init__(self) -> None:
+    def __init__(self, info: Optional[Callable[[], str]] = None) -> None:
+        """
+        info returns extra text printed after the board, e.g. statistics of the bot's last move
+        """
         self.turn_callback: Optional[Callable[[Action], None]] = None
+        self.info = info
 
     def update(self, state: GameState) -> None:
         self.print_board(state)
@@ -46,6 +50,8 @@ class ConsoleView(View):
         
         print(label)
         print(board)
+        if self.info is not None:
+            print(self.info())
 
     def row_of_num(self, w: int, cell_w: int, rownum_w: int) -> str:
         row: str = ' ' * rownum_w
@@ -0,0 +1,206 @@
+from NumRowsFeatures import NumRowsFeatures, Feature
+from base import GameState, Mark
+from typing import List, Tuple, Dict, Optional
+import numpy as np
+from Profiler import profiler
+
+
+class DeltaNumRowsFeatures(NumRowsFeatures):
+    """
+    NumRowsFeatures which keeps features of the current position
+    and computes only the change caused by placing one stone.
+    Row features of a line depend only on cells of this line,
+    so placing a stone changes only four lines through it.
+    """
+    DIRECTIONS = [(0, 1), (1, 1), (1, 0), (1, -1)]
+    ADJACENTS = [(-1, 1), (0, 1), (1, 1), (-1, 0), (1, 0), (-1, -1), (0, -1), (1, -1)]
+
+    def __init__(self, row=5):
+        super().__init__(row)
+        self._index: Dict = dict((n, i) for i, n in enumerate(self._feature_names))
+        self._alone_count_i: int = self._index['alone_count']
+        self._alone_alone_i: int = self._index['alone_alone']
+        self.board: np.ndarray = np.zeros((0, 0), dtype=np.int8)
+        self.current_player: Mark = Mark.X
+        self.features: np.ndarray = np.zeros(self.features_count(), dtype=int)
+        self.stones: int = 0
+        self._lines_cache: Dict[Tuple[int, int], np.ndarray] = {}
+        self._state_key: Optional[Tuple] = None
+
+    def set_state(self, state: GameState) -> np.ndarray:
+        """
+        Memorizes position (as if state.current_player is going to place a stone)
+        and computes its features from scratch
+        """
+        self.board = state.board
+        self.current_player = state.current_player
+        self.features = self.get_features(state)
+        self.stones = int(np.count_nonzero(self.board != Mark.NO.value))
+        self._lines_cache = {}
+        self._state_key = None
+        return self.features
+
+    def ensure_state(self, state: GameState) -> None:
+        """
+        set_state() unless the position is already set, e.g. for chunks of candidates of one move.
+        Positions are recognized by Zobrist hash and board geometry, states without hash are always set
+        """
+        key = (state.hash, state.board.shape, state.origin) if state.hash is not None else None
+        if key is not None and key == self._state_key:
+            # same position, the board may be another copy of it
+            self.board = state.board
+            return
+        with profiler.timer('features.set_state'):
+            self.set_state(state)
+        self._state_key = key
+
+    def get_features_at(self, row: int, col: int) -> np.ndarray:
+        """
+        Features of the position after current player places a stone on (row, col)
+        """
+        return self.features + self.get_delta(row, col)
+
+    def get_features_batch(self, state: GameState, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        self.ensure_state(state)
+        profiler.count('features.deltas', len(rows))
+        batch = np.empty((len(rows), len(self.features)), dtype=int)
+        for i, (r, c) in enumerate(zip(rows, cols)):
+            batch[i] = self.features + self.get_delta(r, c)
+        return batch
+
+    def get_delta(self, row: int, col: int) -> np.ndarray:
+        """
+        Change of features caused by placing a stone of current player on (row, col)
+        """
+        board = self.board
+        if board[row, col] != Mark.NO.value:
+            raise RuntimeError('Cell already used')
+        delta = np.zeros(len(self.features), dtype=int)
+        curr_value = self.current_player.value
+
+        for d_i in range(len(self.DIRECTIONS)):
+            line, pos, key = self._line(row, col, d_i)
+            old = self._lines_cache.get(key)
+            if old is None:
+                old = self._line_features(line, curr_value)
+                self._lines_cache[key] = old
+            line[pos] = curr_value
+            delta += self._line_features(line, curr_value) - old
+
+        delta[self._alone_count_i] = self._alone_delta(row, col)
+        alone_alone = 1 if self.stones + 1 <= 1 else 0
+        delta[self._alone_alone_i] = alone_alone - self.features[self._alone_alone_i]
+        return delta
+
+    def _line(self, row: int, col: int, d_i: int) -> Tuple[List[int], int, Tuple[int, int]]:
+        # cells of the line through (row, col) in order of NumRowsFeatures traversal,
+        # position of (row, col) in it and key of the line
+        board = self.board
+        h, w = board.shape
+        if d_i == 0:
+            return board[row, :].tolist(), col, (d_i, row)
+        if d_i == 1:
+            return np.diagonal(board, col - row).tolist(), min(row, col), (d_i, col - row)
+        if d_i == 2:
+            return board[:, col].tolist(), row, (d_i, col)
+        return np.diagonal(board[:, ::-1], w - 1 - col - row).tolist(), min(row, w - 1 - col), (d_i, row + col)
+
+    def _line_features(self, line: List[int], curr_value: int) -> np.ndarray:
+        # the same walk as NumRowsFeatures.find_rows, but on one line
+        features = np.zeros(len(self._feature_names), dtype=int)
+        no_value = Mark.NO.value
+        n = len(line)
+        visited = [False] * n
+
+        for p in range(n):
+            m = line[p]
+            if m == no_value or visited[p]:
+                continue
+            s = 1
+            cnt = 1
+            enemy_behind = False
+
+            # look forward
+            nq = p
+            steal = True
+            for _ in range(self.row):
+                nq += 1
+                if nq == n:
+                    if steal:
+                        enemy_behind = True
+                    break
+                nm = line[nq]
+                if nm == m:
+                    cnt += 1
+                    visited[nq] = True
+                    steal = True
+                elif nm != no_value:
+                    if steal:
+                        enemy_behind = True
+                    break
+                else:
+                    steal = False
+                s += 1
+                if s == self.row:
+                    break
+
+            # look backward
+            nq = p
+            for i in range(self.row):
+                nq -= 1
+                if nq < 0:
+                    if steal:
+                        enemy_behind = True
+                    break
+                nm = line[nq]
+                if nm == m:
+                    cnt += 1
+                    visited[nq] = True
+                elif nm != no_value:
+                    if i == 0:
+                        enemy_behind = True
+                    break
+                s += 1
+                if s >= self.row:
+                    break
+
+            if s < self.row:  # between enemies
+                continue
+
+            if cnt > 1:
+                if cnt > self.row:
+                    cnt = self.row
+                if cnt == self.row:
+                    enemy_behind = False
+                mark = 1 if m == curr_value else 2
+                features[self._index[Feature(mark, cnt, enemy_behind)]] += 1
+        return features
+
+    def _alone_delta(self, row: int, col: int) -> int:
+        board = self.board
+        h, w = board.shape
+        no_value = Mark.NO.value
+        delta = 0
+        has_neighbour = False
+        for dr, dc in self.ADJACENTS:
+            nr = row + dr
+            nc = col + dc
+            if 0 <= nr < h and 0 <= nc < w and board[nr, nc] != no_value:
+                has_neighbour = True
+                if self._neighbours_count(nr, nc) == 0:
+                    delta -= 1  # neighbour was alone before
+        if not has_neighbour:
+            delta += 1
+        return delta
+
+    def _neighbours_count(self, row: int, col: int) -> int:
+        board = self.board
+        h, w = board.shape
+        no_value = Mark.NO.value
+        cnt = 0
+        for dr, dc in self.ADJACENTS:
+            nr = row + dr
+            nc = col + dc
+            if 0 <= nr < h and 0 <= nc < w and board[nr, nc] != no_value:
+                cnt += 1
+        return cnt
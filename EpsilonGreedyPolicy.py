@@ -1,46 +1,36 @@
 from base import Policy, GameState
-import random
+from ActionBatch import ActionBatch
 import numpy as np
-from typing import List
-from QLearningApproximationAgent import ActionInfo
+from typing import Optional
 import logging
 
 
 class EpsilonGreedyPolicy(Policy):
-    def __init__(self, epsilon: float, seed: int = None, debug: bool = False):
+    def __init__(self, epsilon: float, seed: Optional[int] = None, debug: bool = False):
         self.seed = seed
-        if self.seed is not None:
-            random.seed(seed)
-            self.random_state = random.getstate()
-
+        self.rng = np.random.default_rng(seed)
         self.epsilon = epsilon
         self.debug = debug
 
-    def get_action(self, state: GameState, actions: List[ActionInfo]) -> ActionInfo:
+    def get_action(self, state: GameState, actions: ActionBatch) -> int:
         """
-        actions is list of (action, weight),
+        Index of the chosen action: random one with probability epsilon,
+        otherwise one with max Q value, ties are broken at random
         """
         if self.debug:
             logging.info(f'{self.__class__.__name__}.get_action()')
-        if self.epsilon > random.random():
+        if self.epsilon > self.rng.random():
             # exploration
             if self.debug:
                 logging.info('exploration')
-            if self.seed is not None:
-                random.setstate(self.random_state)
-
-            action = random.choice(actions)
+            return int(self.rng.integers(len(actions)))
 
-            if self.seed is not None:
-                self.random_state = random.getstate()
-        else:
-            # exploitation
-            max_Q_value = np.max([a.new_Q_value for a in actions])
-            max_actions = [a for a in actions if a.new_Q_value == max_Q_value]
-            if self.debug:
-                info = 'exploitation\n'
-                info += f'max_Q_value: {max_Q_value}, total values: {len(actions)}, with max Q_value: {len(max_actions)}\n'
-                logging.info(info)
-            action = random.choice(max_actions)
-
-        return action
+        # exploitation
+        best = actions.best()
+        if self.debug:
+            info = 'exploitation\n'
+            info += f'max_Q_value: {actions.Q[best[0]]}, total values: {len(actions)}, with max Q_value: {len(best)}\n'
+            logging.info(info)
+        if len(best) == 1:
+            return int(best[0])
+        return int(best[self.rng.integers(len(best))])
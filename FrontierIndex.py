@@ -0,0 +1,124 @@
+from base import Mark
+import numpy as np
+from typing import Dict, Optional, Set, Tuple
+
+Cell = Tuple[int, int]  # position relative to origin of the board, stable when the board is extended
+
+
+class FrontierIndex:
+    """
+    Incrementally maintained neighbourhood of the stones:
+    near[cell] is the number of stones within Chebyshev radius of the cell,
+    frontier is the set of empty cells with near > 0,
+    adjacent[cell] is the number of stones among 8 neighbours of the cell,
+    alone_count is the number of stones without adjacent stones.
+    place() and remove() cost O(radius^2), cells are kept relative to origin
+    so extension of an infinite board doesn't touch the index.
+    """
+    def __init__(self, radius: int = 2):
+        self.radius = radius
+        self.stones: Dict[Cell, int] = {}
+        self.near: Dict[Cell, int] = {}
+        self.adjacent: Dict[Cell, int] = {}
+        self.frontier: Set[Cell] = set()
+        self.alone_count: int = 0
+        self._offsets = [(dr, dc) for dr in range(-radius, radius + 1) for dc in range(-radius, radius + 1)
+                         if (dr, dc) != (0, 0)]
+        self._adjacent_offsets = [(dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if (dr, dc) != (0, 0)]
+
+    @classmethod
+    def from_board(cls, board: np.ndarray, origin: Tuple[int, int] = (0, 0), radius: int = 2) -> 'FrontierIndex':
+        index = cls(radius)
+        for r, c in np.argwhere(board != Mark.NO.value):
+            index.place(int(r) - origin[0], int(c) - origin[1], int(board[r, c]))
+        return index
+
+    def copy(self) -> 'FrontierIndex':
+        """
+        Independent snapshot, later place() and remove() of either index don't affect the other
+        """
+        index = FrontierIndex(self.radius)
+        index.stones = dict(self.stones)
+        index.near = dict(self.near)
+        index.adjacent = dict(self.adjacent)
+        index.frontier = set(self.frontier)
+        index.alone_count = self.alone_count
+        return index
+
+    def __len__(self) -> int:
+        return len(self.frontier)
+
+    def place(self, row: int, col: int, mark: int) -> None:
+        cell = (row, col)
+        self.stones[cell] = mark
+        self.frontier.discard(cell)
+        for dr, dc in self._offsets:
+            n = (row + dr, col + dc)
+            count = self.near.get(n, 0) + 1
+            self.near[n] = count
+            if count == 1 and n not in self.stones:
+                self.frontier.add(n)
+
+        neighbours = 0
+        for dr, dc in self._adjacent_offsets:
+            n = (row + dr, col + dc)
+            count = self.adjacent.get(n, 0)
+            if n in self.stones:
+                neighbours += 1
+                if count == 0:
+                    self.alone_count -= 1
+            self.adjacent[n] = count + 1
+        if neighbours == 0:
+            self.alone_count += 1
+
+    def remove(self, row: int, col: int) -> None:
+        cell = (row, col)
+        del self.stones[cell]
+        if self.near.get(cell, 0) > 0:
+            self.frontier.add(cell)
+        for dr, dc in self._offsets:
+            n = (row + dr, col + dc)
+            count = self.near[n] - 1
+            if count == 0:
+                del self.near[n]
+                self.frontier.discard(n)
+            else:
+                self.near[n] = count
+
+        neighbours = 0
+        for dr, dc in self._adjacent_offsets:
+            n = (row + dr, col + dc)
+            count = self.adjacent[n] - 1
+            if count == 0:
+                del self.adjacent[n]
+            else:
+                self.adjacent[n] = count
+            if n in self.stones:
+                neighbours += 1
+                if count == 0:
+                    self.alone_count += 1
+        if neighbours == 0:
+            self.alone_count -= 1
+
+    def is_alone(self) -> int:
+        """
+        1 if no two stones are adjacent, as NumRowsFeatures.is_alone
+        """
+        return int(self.alone_count == len(self.stones))
+
+    def candidates(self, origin: Tuple[int, int], shape: Optional[Tuple[int, int]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Frontier cells in board coordinates, the most crowded first (ties by row, column),
+        cells outside of the board of shape are dropped
+        """
+        if not self.frontier:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        cells = np.array(sorted(self.frontier), dtype=np.intp)
+        counts = np.array([self.near[(r, c)] for r, c in cells.tolist()])
+        rows = cells[:, 0] + origin[0]
+        cols = cells[:, 1] + origin[1]
+        if shape is not None:
+            inside = (rows >= 0) & (rows < shape[0]) & (cols >= 0) & (cols < shape[1])
+            rows, cols, counts = rows[inside], cols[inside], counts[inside]
+        order = np.argsort(-counts, kind='stable')
+        return rows[order], cols[order]
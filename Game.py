@@ -1,6 +1,11 @@
-from base import Agent, View, Mark, Player, GameState, Action
-from typing import Optional, IO
-import numpy as np
+from base import Agent, View, Mark, Player, GameState, Action, is_win_at
+from GrowableBoard import GrowableBoard
+from BitboardPosition import BitboardPosition
+from GameRecordLog import GameRecordWriter
+from ZobristHash import ZobristHash
+from FrontierIndex import FrontierIndex
+from Profiler import profiler
+from typing import Optional, IO, List, Tuple
 import logging
 
 
@@ -15,14 +20,24 @@ class Game:
                  play: bool = True,
                  debug: bool = False,
                  game_no: int = 0,
-                 log_file: Optional[IO] = None
+                 log_file: Optional[IO] = None,
+                 win_check: str = 'last_move',
+                 record_log: Optional[GameRecordWriter] = None,
+                 frontier_radius: int = 2
                  ):
         self.width: Optional[int] = m
         self.height: Optional[int] = n
         self.row: int = k # win row
         self.debug = debug
         self.log_file = log_file
+        self.record_log = record_log
         self.game_no = game_no
+        if win_check not in ('last_move', 'full', 'validate', 'bitboard'):
+            raise ValueError(f'Unknown win check mode: {win_check}')
+        # 'last_move' inspects only lines through the placed stone,
+        # 'full' scans the whole board, 'validate' runs both and compares,
+        # 'bitboard' keeps BitboardPosition mirror and checks it by shifts
+        self.win_check = win_check
 
         width = m
         height = n
@@ -40,17 +55,32 @@ class Game:
         if self.height is None:
             height = self.row * 2 + 1
 
-        self.board = np.full((height, width), Mark.NO.value)
+        self.grid = GrowableBoard(height, width)
+        self.board = self.grid.view
+
+        self.bitboard: Optional[BitboardPosition] = None
+        # empty cells near the stones, relative to origin
+        self.frontier = FrontierIndex(frontier_radius)
 
         self.player1 = Player(Mark.X, player1)
         self.player2 = Player(Mark.O, player2)
 
         if auto_first_turn:
-            self.board[self.row, self.row] = self.player1.mark.value
+            self.grid.set(self.row, self.row, self.player1.mark.value)
+            self.frontier.place(self.row, self.row, self.player1.mark.value)
             self.current_player = self.player2
         else:
             self.current_player = self.player1
 
+        if self.win_check == 'bitboard':
+            self.bitboard = BitboardPosition.from_array(self.board, self.row)
+
+        # moves made by push(), taken back by pop()
+        self.undo: List[Tuple] = []
+
+        self.zobrist = ZobristHash()
+        self.hash: int = self.zobrist.hash_board(self.board, self.current_player.mark, self.grid.origin)
+
         self.view = view
         if self.view is not None:
             self.view.turn_callback = self.apply_action
@@ -64,46 +94,91 @@ class Game:
             info += f'\nplayer2({self.player2.mark.name}): {self.player2.agent.__class__.__name__}'
             logging.info(info)
 
+        self.winner = Mark.NO
+        self.end_game = False
+        self.turn_no = 0
+
         if play:
             self.start()
 
     def apply_action(self, action: Action) -> None:
         row, column = action
-        if self.log_file is not None:
-            self.log_file.write(f'"{row}";"{column}"\n')
+        profiler.count('game.moves')
+        with profiler.timer('game.log'):
+            if self.log_file is not None:
+                self.log_file.write(f'"{row}";"{column}"\n')
+            if self.record_log is not None:
+                h, w = self.board.shape
+                self.record_log.write_move(self.game_no, self.turn_no, self.current_player.mark.value, h, w, row, column)
         if self.board[row][column] != Mark.NO.value:
             raise RuntimeError('Cell already used')
-        self.board[row][column] = self.current_player.mark.value
+        self.place(row, column)
+
+        # one copy of the position for agents' callbacks and views
+        self.state = self.new_state()
+        if self.end_game:
+            if self.winner != Mark.NO:
+                # distribution of elephants
+                if self.current_player == self.player1:
+                    self.player1.agent.win(self.state)
+                    self.player2.agent.loss(self.state)
+                elif self.current_player == self.player2:
+                    self.player1.agent.loss(self.state)
+                    self.player2.agent.win(self.state)
+            else:
+                self.player1.agent.draw(self.state)
+                self.player2.agent.draw(self.state)
+
+        if self.end_game and self.record_log is not None:
+            for player in [self.player1, self.player2]:
+                self.log_learn_array(player)
+
+        self.update_view()
+
+        if not self.end_game:
+            self.turn_no += 1
+            self.get_action()
+
+    def place(self, row: int, column: int) -> None:
+        """
+        Puts the current player's stone, checks the end of the game,
+        otherwise extends infinite board and passes the turn
+        """
+        self.grid.set(row, column, self.current_player.mark.value)
+        self.frontier.place(row - self.grid.origin_row, column - self.grid.origin_col, self.current_player.mark.value)
+        if self.bitboard is not None:
+            self.bitboard.place(row, column, self.current_player.mark)
+        self.hash ^= self.zobrist.key(row - self.grid.origin_row, column - self.grid.origin_col, self.current_player.mark.value)
 
         # check for win
-        self.winner = self.check_win()
+        with profiler.timer('game.win_check'):
+            if self.win_check == 'last_move':
+                self.winner = self.check_win_at(row, column)
+            elif self.win_check == 'full':
+                self.winner = self.check_win()
+            elif self.bitboard is not None:
+                self.winner = self.current_player.mark if self.bitboard.is_win(self.current_player.mark) else Mark.NO
+            else:
+                self.winner = self.check_win_at(row, column)
+                full_winner = self.check_win()
+                if (self.winner != Mark.NO) != (full_winner != Mark.NO):
+                    raise RuntimeError(f'Win check mismatch: last move {self.winner}, full scan {full_winner}')
 
         if self.winner != Mark.NO:
             self.end_game = True
             # obviously, the winner is current player
             self.winner = self.current_player.mark
 
-            # distribution of elephants
-            if self.current_player == self.player1:
-                self.player1.agent.win(self.new_state())
-                self.player2.agent.loss(self.new_state())
-            elif self.current_player == self.player2:
-                self.player1.agent.loss(self.new_state())
-                self.player2.agent.win(self.new_state())
-
         # check for draw
         elif len(self.board[self.board == Mark.NO.value]) == 0:
             self.end_game = True
-            self.player1.agent.draw(self.new_state())
-            self.player2.agent.draw(self.new_state())
         elif self.turn_no == 200:
             self.end_game = True
-            self.player1.agent.draw(self.new_state())
-            self.player2.agent.draw(self.new_state())
         else:
             # extend board
             if self.width is None or self.height is None:
-                self.extend_board()
+                with profiler.timer('game.extend_board'):
+                    self.extend_board()
 
             if self.current_player == self.player1:
                 self.current_player = self.player2
@@ -111,25 +186,76 @@ class Game:
                 self.current_player = self.player1
             else:
                 raise RuntimeError('Unknown player')
+            self.hash ^= self.zobrist.side
 
-        self.state = self.new_state()
-        self.update_view()
-
+    def push(self, action: Action) -> Mark:
+        """
+        Makes the move in place without agents, views and logs, pop() takes it back.
+        Returns the winner after the move
+        """
+        row, column = action
+        if self.end_game:
+            raise RuntimeError('Game is over')
+        if self.board[row, column] != Mark.NO.value:
+            raise RuntimeError('Cell already used')
+        # the stone is kept relative to origin, extension after the move shifts the board
+        self.undo.append((row - self.grid.origin_row, column - self.grid.origin_col, self.current_player,
+                          self.winner, self.end_game, self.turn_no, self.hash, self.grid.geometry()))
+        self.place(row, column)
         if not self.end_game:
             self.turn_no += 1
-            self.get_action()
+        return self.winner
+
+    def pop(self) -> Action:
+        """
+        Takes back the last push(): board, its geometry, side to move and the game result.
+        Returns the move in board coordinates after the restore
+        """
+        if not self.undo:
+            raise RuntimeError('Nothing to pop')
+        row, column, self.current_player, self.winner, self.end_game, self.turn_no, self.hash, geometry = self.undo.pop()
+        self.grid.set(row + self.grid.origin_row, column + self.grid.origin_col, Mark.NO.value)
+        self.frontier.remove(row, column)
+        extended = geometry[:4] != self.grid.geometry()[:4]
+        self.board = self.grid.restore(geometry)
+        row += self.grid.origin_row
+        column += self.grid.origin_col
+        if self.bitboard is not None:
+            if extended:
+                self.bitboard = BitboardPosition.from_array(self.board, self.row)
+            else:
+                self.bitboard.remove(row, column)
+        return Action(row, column)
+
+    def state_view(self) -> GameState:
+        """
+        Current position without copying the board: the board is a read-only view,
+        valid until the next move, push() or pop()
+        """
+        board = self.board.view()
+        board.flags.writeable = False
+        return GameState(board, self.current_player.mark, self.end_game, self.winner, self.hash, self.grid.origin, self.frontier)
 
     def get_action(self):
-        if self.log_file is not None:
-            h, w = self.state.board.shape
-            self.log_file.write(f'"{self.game_no}";"{self.turn_no}";"{self.current_player.mark.name}";"{h}";"{w}";"{self.current_player.agent.get_learn_params()}";')
-        action = self.current_player.agent.get_action(self.state)
+        with profiler.timer('game.log'):
+            if self.log_file is not None:
+                h, w = self.state.board.shape
+                self.log_file.write(f'"{self.game_no}";"{self.turn_no}";"{self.current_player.mark.name}";"{h}";"{w}";"{self.current_player.agent.get_learn_params()}";')
+            if self.record_log is not None and self.record_log.theta_due(self.turn_no):
+                self.log_learn_array(self.current_player)
+        with profiler.timer('game.agent'):
+            action = self.current_player.agent.get_action(self.state)
         if action is None:
             return # wait callback from UI
         else:
             #row, column = action
             self.apply_action(action)
 
+    def log_learn_array(self, player: Player) -> None:
+        params = player.agent.get_learn_array()
+        if params is not None:
+            self.record_log.write_theta(self.game_no, self.turn_no, player.mark.value, params)
+
     def start(self) -> None:
         self.winner = Mark.NO
         self.end_game = False
@@ -143,7 +269,8 @@ class Game:
         self.get_action()
 
     def new_state(self) -> GameState:
-        state = GameState(self.board.copy(), self.current_player.mark, self.end_game, self.winner)
+        # agents keep states across moves, so the state gets a snapshot of the index, state_view() shares the live one
+        state = GameState(self.board.copy(), self.current_player.mark, self.end_game, self.winner, self.hash, self.grid.origin, self.frontier.copy())
         return state
 
     def update_view(self):
@@ -235,6 +362,15 @@ class Game:
 
         return Mark.NO
 
+    def check_win_at(self, row: int, column: int) -> Mark:
+        """
+        Checks only four lines through the cell (row, column),
+        at most 2k-1 cells in each direction
+        """
+        if is_win_at(self.board, row, column, self.row):
+            return Mark(int(self.board[row, column]))
+        return Mark.NO
+
     def check_cell(self, cell, player, count):
         if cell == Mark.NO.value:
             player = Mark.NO.value
@@ -248,39 +384,15 @@ class Game:
         return (player, count)
 
     def extend_board(self):
-        top_rows = 0
-        for i, r in enumerate(self.board):
-            if r.sum() > 0:
-                top_rows = i
-                break
-
-        bottom_rows = 0
-        for i, r in enumerate(reversed(self.board)):
-            if r.sum() > 0:
-                bottom_rows = i
-                break
-
-        left_cols = 0
-        for i, c in enumerate(self.board.T):
-            if c.sum() > 0:
-                left_cols = i
-                break
-
-        right_cols = 0
-        for i, c in enumerate(reversed(self.board.T)):
-            if c.sum() > 0:
-                right_cols = i
-                break
-
-        add_top = self.row - top_rows
-        add_bottom = self.row - bottom_rows
-        add_left = self.row - left_cols
-        add_right = self.row - right_cols
-
-        top = np.zeros((add_top, self.board.shape[1]))
-        bottom = np.zeros((add_bottom, self.board.shape[1]))
-
-        left = np.zeros((self.board.shape[0] + add_top + add_bottom, add_left))
-        right = np.zeros((self.board.shape[0] + add_top + add_bottom, add_right))
-
-        self.board = np.c_[left, np.r_[top, self.board, bottom], right]
+        # keep at least win row of empty cells around the stones
+        top_rows, bottom_rows, left_cols, right_cols = self.grid.margins()
+
+        add_top = max(self.row - top_rows, 0)
+        add_bottom = max(self.row - bottom_rows, 0)
+        add_left = max(self.row - left_cols, 0)
+        add_right = max(self.row - right_cols, 0)
+
+        if add_top or add_bottom or add_left or add_right:
+            self.board = self.grid.extend(add_top, add_bottom, add_left, add_right)
+            if self.bitboard is not None:
+                self.bitboard = BitboardPosition.from_array(self.board, self.row)
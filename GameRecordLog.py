@@ -0,0 +1,149 @@
+import numpy as np
+import json
+import os
+from typing import Dict, Any
+
+
+# columns of the move log, one append-only file per column
+MOVE_COLUMNS: Dict[str, Any] = {
+    'game_no': np.int32,
+    'turn': np.int32,
+    'player': np.int8,
+    'height': np.int32,
+    'width': np.int32,
+    'row': np.int32,
+    'column': np.int32,
+}
+
+# columns of the theta snapshots index, theta itself is stored in theta.bin as float64 rows
+THETA_COLUMNS: Dict[str, Any] = {
+    'game_no': np.int32,
+    'turn': np.int32,
+    'player': np.int8,
+}
+
+
+class GameRecordWriter:
+    """
+    Binary columnar game record log.
+    Moves are appended to fixed-width integer column files moves.<column>.bin,
+    theta snapshots to theta.bin (float64 rows) with index columns theta.<column>.bin.
+    Rows are collected in preallocated buffers and written on flush.
+    theta_every=0 writes theta once per game (at the end of the game),
+    theta_every=N also writes it every N turns.
+    """
+    def __init__(self, directory: str, theta_len: int, theta_every: int = 0, buffer_size: int = 4096):
+        self.directory = directory
+        self.theta_len = theta_len
+        self.theta_every = theta_every
+        self.buffer_size = buffer_size
+        os.makedirs(directory, exist_ok=True)
+
+        meta_filename = os.path.join(directory, 'meta.json')
+        if os.path.exists(meta_filename):
+            with open(meta_filename) as f:
+                if json.load(f)['theta_len'] != theta_len:
+                    raise ValueError('theta length differs from the existing log')
+        else:
+            with open(meta_filename, 'w') as f:
+                json.dump({'theta_len': theta_len}, f)
+
+        self._moves = dict((c, np.zeros(buffer_size, dtype=t)) for c, t in MOVE_COLUMNS.items())
+        self._moves_n = 0
+        self._theta_index = dict((c, np.zeros(buffer_size, dtype=t)) for c, t in THETA_COLUMNS.items())
+        self._theta = np.zeros((buffer_size, theta_len), dtype=np.float64)
+        self._theta_n = 0
+
+    def write_move(self, game_no: int, turn: int, player: int, height: int, width: int, row: int, column: int) -> None:
+        i = self._moves_n
+        m = self._moves
+        m['game_no'][i] = game_no
+        m['turn'][i] = turn
+        m['player'][i] = player
+        m['height'][i] = height
+        m['width'][i] = width
+        m['row'][i] = row
+        m['column'][i] = column
+        self._moves_n += 1
+        if self._moves_n == self.buffer_size:
+            self.flush_moves()
+
+    def theta_due(self, turn: int) -> bool:
+        return self.theta_every > 0 and turn % self.theta_every == 0
+
+    def write_theta(self, game_no: int, turn: int, player: int, theta: np.ndarray) -> None:
+        i = self._theta_n
+        self._theta_index['game_no'][i] = game_no
+        self._theta_index['turn'][i] = turn
+        self._theta_index['player'][i] = player
+        self._theta[i] = theta
+        self._theta_n += 1
+        if self._theta_n == self.buffer_size:
+            self.flush_theta()
+
+    def flush_moves(self) -> None:
+        n = self._moves_n
+        for c, values in self._moves.items():
+            with open(os.path.join(self.directory, f'moves.{c}.bin'), 'ab') as f:
+                f.write(values[:n].tobytes())
+        self._moves_n = 0
+
+    def flush_theta(self) -> None:
+        n = self._theta_n
+        for c, values in self._theta_index.items():
+            with open(os.path.join(self.directory, f'theta.{c}.bin'), 'ab') as f:
+                f.write(values[:n].tobytes())
+        with open(os.path.join(self.directory, 'theta.bin'), 'ab') as f:
+            f.write(self._theta[:n].tobytes())
+        self._theta_n = 0
+
+    def flush(self) -> None:
+        self.flush_moves()
+        self.flush_theta()
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self) -> 'GameRecordWriter':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class GameRecordReader:
+    """
+    Memory-maps columns written by GameRecordWriter, nothing is parsed
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, 'meta.json')) as f:
+            self.theta_len: int = json.load(f)['theta_len']
+
+    def _column(self, filename: str, dtype: Any, row_shape: tuple = ()) -> np.ndarray:
+        path = os.path.join(self.directory, filename)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return np.zeros((0,) + row_shape, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r').reshape((-1,) + row_shape)
+
+    def moves(self) -> Dict[str, np.ndarray]:
+        return dict((c, self._column(f'moves.{c}.bin', t)) for c, t in MOVE_COLUMNS.items())
+
+    def theta_index(self) -> Dict[str, np.ndarray]:
+        return dict((c, self._column(f'theta.{c}.bin', t)) for c, t in THETA_COLUMNS.items())
+
+    def theta(self) -> np.ndarray:
+        """
+        (snapshots x theta_len) matrix, rows match theta_index()
+        """
+        return self._column('theta.bin', np.float64, (self.theta_len,))
+
+    def moves_dataframe(self):
+        import pandas as pd
+        return pd.DataFrame(self.moves())
+
+    def theta_dataframe(self):
+        import pandas as pd
+        df = pd.DataFrame(self.theta_index())
+        theta = pd.DataFrame(self.theta(), columns=[f'theta_{i}' for i in range(self.theta_len)])
+        return pd.concat([df, theta], axis=1)
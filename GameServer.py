@@ -0,0 +1,277 @@
+from base import Agent, View, GameState, Mark, Action
+from Game import Game
+from QLearningApproximationAgent import QLearningApproximationAgent
+from EpsilonGreedyPolicy import EpsilonGreedyPolicy
+from DeltaNumRowsFeatures import DeltaNumRowsFeatures
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing as mp
+import numpy as np
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional, Set
+
+# theta of main_human.py
+THETA = [-2.0441405714625684, -0.326450975595147, -0.25331035065294294, 0.6763756236082743, 36.1722596773075, -0.19358975032876868, -0.04520249822590173, 0.23274268398409093, 0.6279499116480793, 0.027023863707913723, -16.330268976495976, -0.2665606082521952, 0.1666772223154195, 0.018204062012422733, -15.864569939264479, -0.27524700830101867, -0.0823975894292377]
+
+MARKS = {'.': Mark.NO, 'X': Mark.X, 'O': Mark.O}
+
+# bot agents of a worker process, one per row length
+_bots: Dict[int, QLearningApproximationAgent] = {}
+_bot_params: Dict[str, Any] = {}
+
+
+def _init_worker(theta: List[float], time_budget: Optional[float]) -> None:
+    _bot_params['theta'] = theta
+    _bot_params['time_budget'] = time_budget
+
+
+def _bot_move(state: GameState, k: int) -> Action:
+    """
+    Runs in a worker process, bots don't learn and keep no history between calls
+    because one worker serves moves of many sessions
+    """
+    bot = _bots.get(k)
+    if bot is None:
+        bot = QLearningApproximationAgent(0.5, 0.5, EpsilonGreedyPolicy(0), DeltaNumRowsFeatures(k), row=k,
+                                          learning=False, theta=np.array(_bot_params['theta']),
+                                          history='last', time_budget=_bot_params['time_budget'],
+                                          frontier_candidates=True)
+        _bots[k] = bot
+    bot.history_actions.clear()
+    bot.seen_stones = set()
+    action = bot.get_action(state)
+    return Action(int(action.row), int(action.col))
+
+
+class RemoteAgent(Agent):
+    """
+    Agent whose moves come from outside of the game: get_action returns None
+    and the game waits for the move through the view's turn_callback
+    """
+    def __init__(self):
+        pass
+
+    def get_action(self, state: GameState) -> Optional[Action]:
+        return None
+
+    def win(self, state: GameState) -> None:
+        pass
+
+    def loss(self, state: GameState) -> None:
+        pass
+
+    def draw(self, state: GameState) -> None:
+        pass
+
+    def get_learn_params(self) -> str:
+        return ''
+
+
+class SessionView(View):
+    def __init__(self) -> None:
+        self.turn_callback: Optional[Callable[[Action], None]] = None
+        self.state: Optional[GameState] = None
+
+    def update(self, state: GameState) -> None:
+        self.state = state
+
+
+class GameSession:
+    """
+    One game on the server, bot is the mark played by the worker pool (NO for two remote players)
+    """
+    def __init__(self, session_id: int, m: Optional[int], n: Optional[int], k: int, bot: Mark):
+        self.id = session_id
+        self.k = k
+        self.bot = bot
+        self.view = SessionView()
+        self.game = Game(RemoteAgent(), RemoteAgent(), m=m, n=n, k=k, view=self.view)
+        self.lock = asyncio.Lock()
+
+    @property
+    def state(self) -> GameState:
+        assert self.view.state is not None
+        return self.view.state
+
+    def bot_to_move(self) -> bool:
+        return not self.state.is_game_end and self.state.current_player == self.bot
+
+    def move(self, row: int, col: int) -> None:
+        board = self.state.board
+        if self.state.is_game_end:
+            raise ValueError('Game is over')
+        if not (0 <= row < board.shape[0] and 0 <= col < board.shape[1]):
+            raise ValueError(f'Cell {row},{col} is out of the board')
+        if board[row, col] != Mark.NO.value:
+            raise ValueError(f'Cell {row},{col} is occupied')
+        assert self.view.turn_callback is not None
+        self.view.turn_callback(Action(row, col))
+
+    def to_dict(self) -> Dict[str, Any]:
+        state = self.state
+        names = dict((m.value, c) for c, m in MARKS.items())
+        return {
+            'session': self.id,
+            'board': [''.join(names[v] for v in row) for row in state.board.tolist()],
+            'origin': list(state.origin),
+            'turn': self.game.turn_no,
+            'current': state.current_player.name,
+            'end': state.is_game_end,
+            'winner': state.winner.name,
+        }
+
+
+class GameServer:
+    """
+    Hosts many concurrent games in one asyncio event loop.
+    Protocol is line-delimited JSON over TCP or Unix socket, one request per line:
+        {"op": "new", "m": 15, "n": 15, "k": 5, "bot": "O"}  m, n null for infinite board, bot null for two remote players
+        {"op": "move", "session": 1, "row": 7, "col": 7}  reply comes after the bot's answer
+        {"op": "state", "session": 1}
+        {"op": "close", "session": 1}
+    Every reply is one line {"ok": true, ...session state} or {"ok": false, "error": "..."},
+    optional "id" of the request is echoed back, so requests can be pipelined.
+    Requests of a connection are served concurrently, requests of a session in order.
+    Bot moves run in a process pool, sessions are dropped when their connection closes.
+    """
+    def __init__(self, workers: int = 2, theta: Optional[List[float]] = None, time_budget: Optional[float] = 0.1):
+        # workers are started on demand, forked ones would inherit sockets of open connections
+        self.theta = theta if theta is not None else THETA
+        self.pool = ProcessPoolExecutor(workers, mp_context=mp.get_context('spawn'), initializer=_init_worker,
+                                        initargs=(self.theta, time_budget))
+        self.sessions: Dict[int, GameSession] = {}
+        self.ids = itertools.count(1)
+        self.moves = 0
+        self.listener: Optional[asyncio.AbstractServer] = None
+        self.connections: Set[asyncio.Task] = set()
+
+    async def start_tcp(self, host: str, port: int) -> None:
+        self.listener = await asyncio.start_server(self.handle_connection, host, port)
+
+    async def start_unix(self, path: str) -> None:
+        self.listener = await asyncio.start_unix_server(self.handle_connection, path)
+
+    async def serve_forever(self) -> None:
+        assert self.listener is not None
+        await self.listener.serve_forever()
+
+    async def close(self) -> None:
+        """
+        Stops listening and waits until open connections are closed by clients
+        """
+        if self.listener is not None:
+            self.listener.close()
+            await self.listener.wait_closed()
+        await asyncio.gather(*self.connections, return_exceptions=True)
+        self.pool.shutdown(cancel_futures=True)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        assert task is not None
+        self.connections.add(task)
+        owned: List[int] = []
+        tasks: Set[asyncio.Task] = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = asyncio.ensure_future(self.reply(line, writer, owned))
+                tasks.add(request)
+                request.add_done_callback(tasks.discard)
+            # client finished sending, answer what is in flight
+            await asyncio.gather(*tasks, return_exceptions=True)
+        except ConnectionError:
+            pass
+        finally:
+            for request in list(tasks):
+                request.cancel()
+            for session_id in owned:
+                self.sessions.pop(session_id, None)
+            writer.close()
+            self.connections.discard(task)
+
+    async def reply(self, line: bytes, writer: asyncio.StreamWriter, owned: List[int]) -> None:
+        request: Dict[str, Any] = {}
+        try:
+            request = json.loads(line)
+            response = await self.dispatch(request, owned)
+            response['ok'] = True
+        except (ValueError, KeyError, TypeError, RuntimeError) as e:
+            response = {'ok': False, 'error': f'{e.__class__.__name__}: {e}'}
+        if isinstance(request, dict) and 'id' in request:
+            response['id'] = request['id']
+        writer.write(json.dumps(response).encode() + b'\n')
+        await writer.drain()
+
+    async def dispatch(self, request: Dict[str, Any], owned: List[int]) -> Dict[str, Any]:
+        op = request['op']
+        if op == 'new':
+            bot = request.get('bot', 'O')
+            k = int(request.get('k', 5))
+            if bot is not None and DeltaNumRowsFeatures(k).features_count() + 1 != len(self.theta):
+                raise ValueError(f'Bot\'s theta doesn\'t fit k={k}')
+            session = GameSession(next(self.ids), request.get('m', 15), request.get('n', 15), k,
+                                  Mark.NO if bot is None else MARKS[bot])
+            self.sessions[session.id] = session
+            owned.append(session.id)
+            async with session.lock:
+                await self.play_bot(session)
+                return session.to_dict()
+
+        session = self.sessions.get(request['session'])
+        if session is None:
+            raise KeyError(f'Unknown session {request["session"]}')
+        if op == 'move':
+            async with session.lock:
+                session.move(int(request['row']), int(request['col']))
+                self.moves += 1
+                await self.play_bot(session)
+                return session.to_dict()
+        if op == 'state':
+            return session.to_dict()
+        if op == 'close':
+            self.sessions.pop(session.id, None)
+            if session.id in owned:
+                owned.remove(session.id)
+            return {'session': session.id}
+        raise ValueError(f'Unknown op: {op}')
+
+    async def play_bot(self, session: GameSession) -> None:
+        loop = asyncio.get_running_loop()
+        while session.bot_to_move():
+            action = await loop.run_in_executor(self.pool, _bot_move, session.state, session.k)
+            session.move(action.row, action.col)
+            self.moves += 1
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    server = GameServer(args.workers, time_budget=args.time_budget if args.time_budget > 0 else None)
+    if args.unix is not None:
+        await server.start_unix(args.unix)
+        logging.info(f'Listening on {args.unix}')
+    else:
+        await server.start_tcp(args.host, args.port)
+        logging.info(f'Listening on {args.host}:{args.port}')
+    try:
+        await server.serve_forever()
+    finally:
+        server.pool.shutdown(cancel_futures=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='m,n,k-game server')
+    parser.add_argument("--host", help="TCP host", type=str, default='127.0.0.1')
+    parser.add_argument("-p", "--port", help="TCP port", type=int, default=8765)
+    parser.add_argument("-u", "--unix", help="Unix socket path instead of TCP", type=str)
+    parser.add_argument("-w", "--workers", help="Bot worker processes", type=int, default=2)
+    parser.add_argument("-t", "--time_budget", help="Bot's time per move in seconds, 0 to evaluate all cells", type=float, default=0.1)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,138 @@
+from base import Mark
+import numpy as np
+from typing import Optional, Tuple
+
+
+class GrowableBoard:
+    """
+    Board store for auto-extended (infinite) fields.
+    Keeps an over-allocated buffer and exposes logical board as a view into it,
+    so extending the board near the edge costs amortized O(1).
+    origin is the logical position of the first logical cell of the initial board,
+    i.e. how many rows/columns were added on the top/left since creation.
+    """
+    def __init__(self, height: int, width: int, dtype=np.int8, growth: float = 2.0):
+        self.dtype = dtype
+        self.growth = growth
+        self.height: int = height
+        self.width: int = width
+        self.origin_row: int = 0
+        self.origin_col: int = 0
+
+        # buffer with free space around logical board
+        self._top: int = height // 2
+        self._left: int = width // 2
+        self._data: np.ndarray = np.full((height * 2, width * 2), Mark.NO.value, dtype=self.dtype)
+
+        # bounding box of occupied cells in logical coordinates
+        self.min_row: Optional[int] = None
+        self.max_row: Optional[int] = None
+        self.min_col: Optional[int] = None
+        self.max_col: Optional[int] = None
+
+        self.view: np.ndarray = self._make_view()
+
+    @property
+    def origin(self) -> Tuple[int, int]:
+        return (self.origin_row, self.origin_col)
+
+    @property
+    def capacity(self) -> Tuple[int, int]:
+        return self._data.shape
+
+    def _make_view(self) -> np.ndarray:
+        return self._data[self._top:self._top + self.height, self._left:self._left + self.width]
+
+    def set(self, row: int, col: int, value: int) -> None:
+        self.view[row, col] = value
+        if value == Mark.NO.value:
+            return
+        if self.min_row is None:
+            self.min_row = self.max_row = row
+            self.min_col = self.max_col = col
+        else:
+            self.min_row = min(self.min_row, row)
+            self.max_row = max(self.max_row, row)
+            self.min_col = min(self.min_col, col)
+            self.max_col = max(self.max_col, col)
+
+    def margins(self) -> Tuple[int, int, int, int]:
+        """
+        Number of empty rows/columns on the top, bottom, left and right of the board
+        """
+        if self.min_row is None:
+            return (self.height, self.height, self.width, self.width)
+        return (self.min_row,
+                self.height - 1 - self.max_row,
+                self.min_col,
+                self.width - 1 - self.max_col)
+
+    def extend(self, add_top: int, add_bottom: int, add_left: int, add_right: int) -> np.ndarray:
+        """
+        Adds empty rows/columns around logical board, returns new logical view
+        """
+        free_top = self._top
+        free_bottom = self._data.shape[0] - self._top - self.height
+        free_left = self._left
+        free_right = self._data.shape[1] - self._left - self.width
+
+        if add_top > free_top or add_bottom > free_bottom or add_left > free_left or add_right > free_right:
+            self._reallocate(add_top, add_bottom, add_left, add_right)
+
+        self._top -= add_top
+        self._left -= add_left
+        self.height += add_top + add_bottom
+        self.width += add_left + add_right
+        self.origin_row += add_top
+        self.origin_col += add_left
+        if self.min_row is not None:
+            self.min_row += add_top
+            self.max_row += add_top
+            self.min_col += add_left
+            self.max_col += add_left
+
+        self.view = self._make_view()
+        return self.view
+
+    def geometry(self) -> Tuple:
+        """
+        Size, origin and bounding box of the logical board, for restore()
+        """
+        return (self.height, self.width, self.origin_row, self.origin_col,
+                self.min_row, self.max_row, self.min_col, self.max_col)
+
+    def restore(self, geometry: Tuple) -> np.ndarray:
+        """
+        Shrinks logical board back to geometry saved before extend() calls,
+        cells added since then must be empty again. Returns new logical view
+        """
+        height, width, origin_row, origin_col, min_row, max_row, min_col, max_col = geometry
+        # logical board keeps its place in the buffer, also after reallocation
+        self._top += self.origin_row - origin_row
+        self._left += self.origin_col - origin_col
+        self.height = height
+        self.width = width
+        self.origin_row = origin_row
+        self.origin_col = origin_col
+        self.min_row = min_row
+        self.max_row = max_row
+        self.min_col = min_col
+        self.max_col = max_col
+        self.view = self._make_view()
+        return self.view
+
+    def _reallocate(self, add_top: int, add_bottom: int, add_left: int, add_right: int) -> None:
+        # grow geometrically, keep the logical board in the middle of new buffer
+        need_h = self.height + add_top + add_bottom
+        need_w = self.width + add_left + add_right
+        cap_h = max(int(self._data.shape[0] * self.growth), need_h * 2)
+        cap_w = max(int(self._data.shape[1] * self.growth), need_w * 2)
+
+        data = np.full((cap_h, cap_w), Mark.NO.value, dtype=self.dtype)
+        top = add_top + (cap_h - need_h) // 2
+        left = add_left + (cap_w - need_w) // 2
+        data[top:top + self.height, left:left + self.width] = self.view
+
+        self._data = data
+        self._top = top
+        self._left = left
@@ -0,0 +1,323 @@
+from base import Agent, Action, GameState, Mark, FeaturesModel, is_win_at, near_cells
+import multiprocessing as mp
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+import logging
+import math
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+Move = Tuple[int, int]  # absolute coordinates: board position minus origin
+
+
+class MCTSNode:
+    __slots__ = ('move', 'player', 'parent', 'children', 'N', 'W', 'prior', 'terminal', 'value')
+
+    def __init__(self, move: Optional[Move], player: int, parent: Optional['MCTSNode'], prior: float):
+        self.move = move
+        self.player = player  # mark value of the player who made the move into this node
+        self.parent = parent
+        self.children: Dict[Move, 'MCTSNode'] = {}
+        self.N = 0
+        self.W = 0.0  # sum of results for self.player
+        self.prior = prior
+        self.terminal = False
+        self.value = 0.0  # result for self.player if terminal
+
+
+def _search_worker(args) -> Tuple[Dict[Move, int], int]:
+    # root parallelization: every worker grows its own tree from the same position
+    params, state, seed = args
+    agent = MCTSAgent(**params, workers=1, reuse_tree=False, seed=seed)
+    root = agent.search(state)
+    return dict((m, c.N) for m, c in root.children.items()), agent.last_playouts
+
+
+class MCTSAgent(Agent):
+    """
+    Monte Carlo Tree Search with PUCT selection.
+    Priors are softmax of one-ply Q values of the linear model (theta . [1, features]),
+    leaves are evaluated by short random playouts near the stones, run for all rollouts of a leaf at once.
+    With workers > 1 independent trees are grown in a process pool and root visits are summed,
+    the pool is shut down at the end of every game (or by close(), the agent is also a context manager).
+    The tree is reused between moves when the opponent's reply is already in it, single worker only.
+    """
+    def __init__(self,
+                 theta: np.ndarray,
+                 features_model: FeaturesModel,
+                 row: int = 5,
+                 time_budget: Optional[float] = 1.0,
+                 playouts: Optional[int] = None,
+                 rollouts_per_leaf: int = 8,
+                 rollout_depth: int = 30,
+                 c_puct: float = 1.5,
+                 temperature: float = 1.0,
+                 radius: int = 2,
+                 workers: int = 1,
+                 reuse_tree: bool = True,
+                 seed: Optional[int] = None,
+                 debug: bool = False
+                 ):
+        if time_budget is None and playouts is None:
+            raise ValueError('time_budget or playouts is required')
+        self.theta = theta
+        self.features_model = features_model
+        self.row = row
+        self.time_budget = time_budget
+        self.playouts = playouts
+        self.rollouts_per_leaf = rollouts_per_leaf
+        self.rollout_depth = rollout_depth
+        self.c_puct = c_puct
+        self.temperature = temperature
+        self.radius = radius
+        self.workers = workers
+        if workers > 1 and reuse_tree:
+            logging.warning(f'{self.__class__.__name__}: tree reuse is off with {workers} workers, every move grows new trees')
+            reuse_tree = False
+        self.reuse_tree = reuse_tree
+        self.debug = debug
+        self.rng = np.random.default_rng(seed)
+
+        self.board: np.ndarray = np.zeros((0, 0), dtype=np.int8)
+        self.origin: Tuple[int, int] = (0, 0)
+        self.root: Optional[MCTSNode] = None
+        self._stones: Set[Move] = set()
+        self._pool = None
+
+        self.last_playouts: int = 0
+        self.last_seconds: float = 0.0
+
+    @property
+    def playouts_per_sec(self) -> float:
+        return self.last_playouts / self.last_seconds if self.last_seconds > 0 else 0.0
+
+    def params(self) -> Dict:
+        return dict(theta=self.theta, features_model=self.features_model, row=self.row,
+                    time_budget=self.time_budget, playouts=self.playouts,
+                    rollouts_per_leaf=self.rollouts_per_leaf, rollout_depth=self.rollout_depth, c_puct=self.c_puct,
+                    temperature=self.temperature, radius=self.radius)
+
+    def get_action(self, state: GameState) -> Action:
+        start = time.perf_counter()
+        if self.workers > 1:
+            if self._pool is None:
+                self._pool = mp.Pool(self.workers)
+            seeds = self.rng.integers(0, 2 ** 31, self.workers)
+            visits: Dict[Move, int] = {}
+            jobs = [(self.params(), state, int(s)) for s in seeds]
+            self.last_playouts = 0
+            for result, playouts in self._pool.map(_search_worker, jobs):
+                for m, n in result.items():
+                    visits[m] = visits.get(m, 0) + n
+                self.last_playouts += playouts
+            move = max(visits, key=lambda m: visits[m])
+        else:
+            root = self.search(state)
+            move = max(root.children, key=lambda m: root.children[m].N)
+            if self.reuse_tree:
+                self.root = root.children[move]
+                self._stones = self.stones_of(state.board, state.origin) | {move}
+        self.last_seconds = time.perf_counter() - start
+        if self.debug:
+            logging.info(f'{self.__class__.__name__}: {self.last_playouts} playouts, {self.playouts_per_sec:.0f} playouts/sec')
+        return Action(move[0] + state.origin[0], move[1] + state.origin[1])
+
+    def stones_of(self, board: np.ndarray, origin: Tuple[int, int]) -> Set[Move]:
+        return set((int(r) - origin[0], int(c) - origin[1]) for r, c in np.argwhere(board != Mark.NO.value))
+
+    def reused_root(self, state: GameState) -> Optional[MCTSNode]:
+        if not self.reuse_tree or self.root is None:
+            return None
+        new_stones = self.stones_of(state.board, state.origin) - self._stones
+        if len(new_stones) != 1:
+            return None
+        node = self.root.children.get(new_stones.pop())
+        if node is not None:
+            node.parent = None
+        return node
+
+    def search(self, state: GameState) -> MCTSNode:
+        self.board = state.board.copy()
+        self.origin = state.origin
+        player = state.current_player.value
+        other = Mark.X.value + Mark.O.value - player
+        root = self.reused_root(state)
+        if root is None:
+            root = MCTSNode(None, other, None, 1.0)
+        if len(root.children) == 0:
+            self.expand(root, player)
+
+        deadline = None if self.time_budget is None else time.perf_counter() + self.time_budget
+        iterations = 0
+        self.last_playouts = 0
+        while True:
+            # terminal leaves count as simulations too, so the budget ends even if the tree is solved
+            if self.playouts is not None and iterations * self.rollouts_per_leaf >= self.playouts:
+                break
+            if deadline is not None and iterations > 0 and time.perf_counter() > deadline:
+                break
+            self.iterate(root)
+            iterations += 1
+        return root
+
+    def iterate(self, root: MCTSNode) -> None:
+        node = root
+        path: List[MCTSNode] = []
+        # selection, moves are made in place on self.board
+        while node.children and not node.terminal:
+            node = self.select(node)
+            r, c = self.to_board(node.move)
+            self.board[r, c] = node.player
+            path.append(node)
+
+        if node.terminal:
+            value = node.value
+        else:
+            r, c = self.to_board(node.move) if node.move is not None else (0, 0)
+            if node.move is not None and is_win_at(self.board, r, c, self.row):
+                node.terminal = True
+                node.value = 1.0
+                value = 1.0
+            else:
+                to_move = Mark.X.value + Mark.O.value - node.player
+                self.expand(node, to_move)
+                if len(node.children) == 0:
+                    node.terminal = True
+                    node.value = 0.0
+                    value = 0.0
+                else:
+                    value = self.rollout(to_move, node.player)
+
+        # backpropagation, value is for the player who moved into node
+        for p in reversed(path):
+            r, c = self.to_board(p.move)
+            self.board[r, c] = Mark.NO.value
+        n: Optional[MCTSNode] = node
+        while n is not None:
+            n.N += 1
+            n.W += value
+            value = -value
+            n = n.parent
+
+    def select(self, node: MCTSNode) -> MCTSNode:
+        sqrt_n = math.sqrt(node.N + 1)
+        best = None
+        best_score = -math.inf
+        for child in node.children.values():
+            q = child.W / child.N if child.N > 0 else 0.0
+            score = q + self.c_puct * child.prior * sqrt_n / (1 + child.N)
+            if score > best_score:
+                best_score = score
+                best = child
+        assert best is not None
+        return best
+
+    def to_board(self, move: Move) -> Tuple[int, int]:
+        return (move[0] + self.origin[0], move[1] + self.origin[1])
+
+    def expand(self, node: MCTSNode, to_move: int) -> None:
+        rows, cols = near_cells(self.board, self.radius)
+        if len(rows) == 0:
+            return
+        state = GameState(self.board, Mark(to_move), False, Mark.NO)
+        X = np.empty((len(rows), len(self.theta)))
+        X[:, 0] = 1
+        X[:, 1:] = self.features_model.get_features_batch(state, rows, cols)
+        q = np.dot(X, self.theta) / self.temperature
+        priors = np.exp(q - q.max())
+        priors /= priors.sum()
+        for r, c, p in zip(rows, cols, priors):
+            move = (int(r) - self.origin[0], int(c) - self.origin[1])
+            node.children[move] = MCTSNode(move, to_move, node, float(p))
+
+    def rollout(self, to_move: int, player: int) -> float:
+        """
+        Random playouts from the current board, mean result for player.
+        rollouts_per_leaf games are played at once, moves are random empty cells within radius of the stones,
+        only lines through the last move are checked for a win,
+        games still running after rollout_depth moves count as draws
+        """
+        h, w = self.board.shape
+        n = self.rollouts_per_leaf
+        self.last_playouts += n
+        boards = np.repeat(self.board[np.newaxis], n, axis=0)
+        near = np.zeros((n, h, w), dtype=bool)
+        rows, cols = near_cells(self.board, self.radius)
+        near[:, rows, cols] = True
+        offsets = [(dr, dc) for dr in range(-self.radius, self.radius + 1) for dc in range(-self.radius, self.radius + 1)]
+
+        winners = np.zeros(n, dtype=np.int8)
+        running = np.arange(n)
+        mark = to_move
+        for _ in range(self.rollout_depth):
+            allowed = near[running].reshape(len(running), -1)
+            scores = self.rng.random(allowed.shape)
+            scores[~allowed] = -1
+            cells = scores.argmax(axis=1)
+            # no empty cell near the stones: the board is full, a draw
+            moved = allowed[np.arange(len(running)), cells]
+            running = running[moved]
+            if len(running) == 0:
+                break
+            r, c = cells[moved] // w, cells[moved] % w
+            boards[running, r, c] = mark
+            for dr, dc in offsets:
+                nr, nc = r + dr, c + dc
+                inside = (nr >= 0) & (nr < h) & (nc >= 0) & (nc < w)
+                b, nr, nc = running[inside], nr[inside], nc[inside]
+                near[b, nr, nc] = boards[b, nr, nc] == Mark.NO.value
+
+            won = self.wins_through(boards, running, r, c, mark)
+            winners[running[won]] = mark
+            running = running[~won]
+            if len(running) == 0:
+                break
+            mark = Mark.X.value + Mark.O.value - mark
+        return float(np.mean(np.where(winners == player, 1.0, np.where(winners == Mark.NO.value, 0.0, -1.0))))
+
+    def wins_through(self, boards: np.ndarray, idx: np.ndarray, rows: np.ndarray, cols: np.ndarray, mark: int) -> np.ndarray:
+        """
+        Whether stones of mark placed on (rows[i], cols[i]) of boards[idx[i]] make k in a row,
+        2k-1 cells of every line through the move are checked for all boards at once
+        """
+        k = self.row
+        _, h, w = boards.shape
+        t = np.arange(-(k - 1), k)
+        won = np.zeros(len(idx), dtype=bool)
+        for d_r, d_c in [(0, 1), (1, 1), (1, 0), (1, -1)]:
+            r = rows[:, np.newaxis] + t * d_r
+            c = cols[:, np.newaxis] + t * d_c
+            inside = (r >= 0) & (r < h) & (c >= 0) & (c < w)
+            own = inside & (boards[idx[:, np.newaxis], np.clip(r, 0, h - 1), np.clip(c, 0, w - 1)] == mark)
+            won |= (sliding_window_view(own, k, axis=1).sum(axis=2) == k).any(axis=1)
+        return won
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self) -> 'MCTSAgent':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def win(self, state: GameState) -> None:
+        self.root = None
+        self.close()
+
+    def loss(self, state: GameState) -> None:
+        self.root = None
+        self.close()
+
+    def draw(self, state: GameState) -> None:
+        self.root = None
+        self.close()
+
+    def get_learn_params(self) -> str:
+        return str(list(self.theta))
+
+    def get_learn_array(self) -> Optional[np.ndarray]:
+        return self.theta
@@ -1,6 +1,7 @@
 from base import FeaturesModel, Mark, GameState
 import numpy as np
 from typing import List, Tuple, Dict, Union, NamedTuple, Any
+from Profiler import profiler
 # import logging
 
 
@@ -34,6 +35,7 @@ class NumRowsFeatures(FeaturesModel):
 
     def get_features(self, state: GameState) -> List[int]:
         # logging.info(f'{self.__class__.__name__}.get_features()')
+        profiler.count('features.get_features')
         board = state.board
         current_player = state.current_player
         occupied = np.where(board != Mark.NO.value)
@@ -47,9 +49,14 @@ class NumRowsFeatures(FeaturesModel):
             features['alone_alone'] = 1
         else:
             features = self.find_rows(board, o, current_player)
-            features['alone_count'] = self.get_alone(o, board)
+            frontier = state.frontier
+            if frontier is not None:
+                # neighbour counts of the game's index, O(1)
+                features['alone_count'] = frontier.alone_count
+            else:
+                features['alone_count'] = self.get_alone(o, board)
             if sum([abs(f) for f in features.values()]) == 0:
-                features['alone_alone'] = self.is_alone(o)
+                features['alone_alone'] = frontier.is_alone() if frontier is not None else self.is_alone(o)
         # logging.info(len(features))
         return np.array(list(features.values()))
 
@@ -155,31 +162,28 @@ class NumRowsFeatures(FeaturesModel):
         return features
 
     def get_alone(self, o: List[Tuple[int, int]], board: np.ndarray):
-        alone_cnt = 0
-        no_value = Mark.NO.value
+        """
+        Number of stones without stones among 8 neighbours
+        """
+        occupied = board != Mark.NO.value
         h, w = board.shape
-        ADJACENTS = {(-1, 1), (0, 1), (1, 1), (-1, 0), (1, 0), (-1, -1), (0, -1), (1, -1)}
-        for r, c in o:
-            found = False
-            for dr, dc in ADJACENTS:
-                nr = r + dr
-                nc = c + dc
-                if 0 <= nr < h and 0 <= nc < w:
-                    board[nr, nc]
-                    if board[nr, nc] != no_value:
-                        found = True
-                        break
-            if not found:
-                alone_cnt += 1
-        return alone_cnt
+        padded = np.zeros((h + 2, w + 2), dtype=np.int8)
+        padded[1:-1, 1:-1] = occupied
+        neighbours = np.zeros((h, w), dtype=np.int8)
+        for dr in range(3):
+            for dc in range(3):
+                if dr != 1 or dc != 1:
+                    neighbours += padded[dr:dr + h, dc:dc + w]
+        return int(np.count_nonzero(occupied & (neighbours == 0)))
 
     def is_alone(self, o: List[Tuple[int, int]]):
-        for p1 in o:
-            np1 = np.array(p1)
-            for p2 in o:
-                if p1 == p2:
-                    continue
-                np2 = np.array(p2)
-                if np.linalg.norm(np1 - np2) < 2:
-                    return 0
+        """
+        1 if no two stones are adjacent
+        """
+        cells = set((int(r), int(c)) for r, c in o)
+        for r, c in cells:
+            for dr in (-1, 0, 1):
+                for dc in (-1, 0, 1):
+                    if (dr != 0 or dc != 0) and (r + dr, c + dc) in cells:
+                        return 0
         return 1
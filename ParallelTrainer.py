@@ -0,0 +1,107 @@
+from base import FeaturesModel
+from Game import Game
+from QLearningApproximationAgent import QLearningApproximationAgent
+from EpsilonGreedyPolicy import EpsilonGreedyPolicy
+from GameRecordLog import GameRecordWriter
+import multiprocessing as mp
+import numpy as np
+import time
+from typing import List, Optional, NamedTuple, IO
+
+
+class WorkerStats(NamedTuple):
+    worker: int
+    games: int
+    seconds: float
+
+    @property
+    def games_per_sec(self) -> float:
+        return self.games / self.seconds if self.seconds > 0 else 0.0
+
+
+def _self_play_worker(worker: int,
+                      games: List[int],
+                      shared_theta,
+                      features_model: FeaturesModel,
+                      row: int,
+                      alfa: float,
+                      gamma: float,
+                      epsilon: float,
+                      log_filename: Optional[str],
+                      record_dir: Optional[str],
+                      results) -> None:
+    # theta is a view into shared memory, agents update it in place without locks
+    theta = np.frombuffer(shared_theta, dtype=np.float64)
+    log_file: Optional[IO] = None
+    if log_filename is not None:
+        log_file = open(f'{log_filename}.{worker}', 'w')
+        log_file.write("game_no;turn;player;height;width;learn_params;row;column\n")
+    record_log: Optional[GameRecordWriter] = None
+    if record_dir is not None:
+        record_log = GameRecordWriter(f'{record_dir}.{worker}', len(theta))
+    start = time.time()
+    played = 0
+    try:
+        for game_no in games:
+            agent1 = QLearningApproximationAgent(alfa, gamma, EpsilonGreedyPolicy(epsilon), theta=theta, features_model=features_model, row=row, inf_field=True, history='last')
+            agent2 = QLearningApproximationAgent(alfa, gamma, EpsilonGreedyPolicy(epsilon), theta=theta, features_model=features_model, row=row, inf_field=True, history='last')
+            Game(player1=agent1, player2=agent2, view=None, m=None, n=None, k=row, log_file=log_file, game_no=game_no, record_log=record_log)
+            played += 1
+    finally:
+        if log_file is not None:
+            log_file.close()
+        if record_log is not None:
+            record_log.close()
+        # report even on failure, so the trainer doesn't wait forever
+        results.put(WorkerStats(worker, played, time.time() - start))
+
+
+class ParallelTrainer:
+    """
+    Self-play on the infinite field in several processes.
+    All workers share one theta in shared memory and update it lock-free (Hogwild! style),
+    so every worker sees updates of the others immediately.
+    """
+    def __init__(self,
+                 workers: int,
+                 features_model: FeaturesModel,
+                 theta: Optional[np.ndarray] = None,
+                 row: int = 5,
+                 alfa: float = 0.5,
+                 gamma: float = 0.5,
+                 epsilon: float = 0.05,
+                 log_filename: Optional[str] = None,
+                 record_dir: Optional[str] = None
+                 ):
+        self.workers = workers
+        self.features_model = features_model
+        self.row = row
+        self.alfa = alfa
+        self.gamma = gamma
+        self.epsilon = epsilon
+        self.log_filename = log_filename
+        self.record_dir = record_dir
+
+        size = self.features_model.features_count() + 1
+        self.shared_theta = mp.RawArray('d', size)
+        self.theta = np.frombuffer(self.shared_theta, dtype=np.float64)
+        if theta is not None:
+            self.theta[:] = theta
+
+    def train(self, games_count: int) -> List[WorkerStats]:
+        results: mp.Queue = mp.Queue()
+        processes = []
+        for w in range(self.workers):
+            games = list(range(w, games_count, self.workers))
+            p = mp.Process(target=_self_play_worker,
+                           args=(w, games, self.shared_theta, self.features_model, self.row,
+                                 self.alfa, self.gamma, self.epsilon, self.log_filename, self.record_dir, results))
+            p.start()
+            processes.append(p)
+
+        stats = [results.get() for _ in processes]
+        for p in processes:
+            p.join()
+            if p.exitcode != 0:
+                raise RuntimeError(f'Self-play worker failed with exit code {p.exitcode}')
+        return sorted(stats)
@@ -0,0 +1,125 @@
+import json
+import math
+import time
+from typing import Dict, IO, Any, List
+
+
+class _NullTimer:
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *args) -> None:
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler: 'Profiler', name: str):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *args) -> None:
+        self.profiler.record(self.name, time.perf_counter() - self.start)
+
+
+class TimerStats:
+    """
+    Aggregated durations of one timer, histogram buckets are powers of two of microseconds
+    """
+    __slots__ = ('count', 'total', 'min', 'max', 'buckets')
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.buckets: Dict[int, int] = {}
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        us = seconds * 1e6
+        b = int(math.log2(us)) if us >= 1 else 0
+        self.buckets[b] = self.buckets.get(b, 0) + 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'min': self.min if self.count else 0.0,
+            'max': self.max,
+            'histogram_us_log2': dict((str(k), v) for k, v in sorted(self.buckets.items())),
+        }
+
+
+class Profiler:
+    """
+    Named timers and counters for phases of a move.
+    When disabled, timer() returns a shared no-op context and count() returns at once,
+    so the hooks can stay in the code all the time.
+    """
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.timers: Dict[str, TimerStats] = {}
+        self.counters: Dict[str, int] = {}
+
+    def timer(self, name: str) -> Any:
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def record(self, name: str, seconds: float) -> None:
+        stats = self.timers.get(name)
+        if stats is None:
+            stats = self.timers[name] = TimerStats()
+        stats.add(seconds)
+
+    def count(self, name: str, n: int = 1) -> None:
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def reset(self) -> None:
+        self.timers = {}
+        self.counters = {}
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'timers': dict((name, s.to_dict()) for name, s in sorted(self.timers.items())),
+            'counters': dict(sorted(self.counters.items())),
+        }
+
+    def dump_json(self, file: IO, **extra: Any) -> None:
+        """
+        Appends one JSON line with aggregated timers and counters
+        """
+        file.write(json.dumps({**extra, **self.snapshot()}) + '\n')
+
+    def dump_csv(self, file: IO, **extra: Any) -> None:
+        """
+        Appends rows kind;name;count;total;mean;min;max with extra values as leading columns
+        """
+        prefix = ''.join(f'"{v}";' for v in extra.values())
+        rows: List[str] = []
+        for name, s in sorted(self.timers.items()):
+            d = s.to_dict()
+            rows.append(f'{prefix}"timer";"{name}";"{d["count"]}";"{d["total"]}";"{d["mean"]}";"{d["min"]}";"{d["max"]}"\n')
+        for name, n in sorted(self.counters.items()):
+            rows.append(f'{prefix}"counter";"{name}";"{n}";"";"";"";""\n')
+        file.write(''.join(rows))
+
+
+# process-wide profiler used by hooks in Game, agents and features models
+profiler = Profiler()
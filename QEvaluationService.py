@@ -0,0 +1,161 @@
+from concurrent.futures import Future
+from collections import deque
+import numpy as np
+import threading
+import time
+from typing import Any, Deque, Dict, List, Tuple
+
+
+class QEvaluationService:
+    """
+    Micro-batching Q evaluation for games running concurrently in threads of one process.
+    Callers submit (rows x features) matrices, the service thread concatenates requests
+    until max_batch rows are collected or max_wait seconds passed since the oldest one,
+    runs one matrix product with theta and hands every caller its slice.
+    theta is shared, not copied: in place updates (agent.theta is service.theta) are seen
+    by the next batch of every game.
+    """
+    def __init__(self, theta: np.ndarray, max_batch: int = 4096, max_wait: float = 0.001, samples: int = 10000):
+        self.theta = theta
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue: Deque[Tuple[np.ndarray, Future, float]] = deque()
+        self.cond = threading.Condition()
+        self.closed = False
+
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+        self.busy = 0.0
+        self.started = time.perf_counter()
+        # submit -> batch start, seconds of the last samples requests
+        self.queue_wait: Deque[float] = deque(maxlen=samples)
+
+        self.thread = threading.Thread(target=self.run, name='QEvaluationService', daemon=True)
+        self.thread.start()
+
+    def submit(self, X: np.ndarray) -> Future:
+        future: Future = Future()
+        with self.cond:
+            if self.closed:
+                raise RuntimeError('Service is closed')
+            self.queue.append((X, future, time.perf_counter()))
+            self.cond.notify()
+        return future
+
+    def evaluate(self, X: np.ndarray) -> np.ndarray:
+        """
+        Q values of the rows of X, blocks until the batch is done
+        """
+        return self.submit(X).result()
+
+    def close(self) -> None:
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+        self.thread.join()
+
+    def next_batch(self) -> List[Tuple[np.ndarray, Future, float]]:
+        with self.cond:
+            while not self.queue and not self.closed:
+                self.cond.wait()
+            if not self.queue:
+                return []
+            deadline = self.queue[0][2] + self.max_wait
+            while not self.closed and sum(len(x) for x, _, _ in self.queue) < self.max_batch:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                self.cond.wait(timeout)
+            batch = []
+            rows = 0
+            # a single request larger than max_batch still goes as one batch
+            while self.queue and (not batch or rows + len(self.queue[0][0]) <= self.max_batch):
+                item = self.queue.popleft()
+                batch.append(item)
+                rows += len(item[0])
+            return batch
+
+    def run(self) -> None:
+        while True:
+            batch = self.next_batch()
+            if not batch:
+                return
+            start = time.perf_counter()
+            for _, _, submitted in batch:
+                self.queue_wait.append(start - submitted)
+            try:
+                X = batch[0][0] if len(batch) == 1 else np.concatenate([x for x, _, _ in batch])
+                Q = np.dot(X, self.theta)
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            offset = 0
+            for x, future, _ in batch:
+                future.set_result(Q[offset:offset + len(x)])
+                offset += len(x)
+            self.busy += time.perf_counter() - start
+            self.requests += len(batch)
+            self.rows += len(X)
+            self.batches += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        seconds = time.perf_counter() - self.started
+        wait_ms = np.array(self.queue_wait) * 1e3
+        return {
+            'requests': self.requests,
+            'rows': self.rows,
+            'batches': self.batches,
+            'rows_per_batch': self.rows / self.batches if self.batches else 0.0,
+            'requests_per_batch': self.requests / self.batches if self.batches else 0.0,
+            'rows_per_sec': self.rows / seconds if seconds > 0 else 0.0,
+            'busy': self.busy / seconds if seconds > 0 else 0.0,
+            'queue_wait_p50_ms': float(np.percentile(wait_ms, 50)) if len(wait_ms) else 0.0,
+            'queue_wait_p99_ms': float(np.percentile(wait_ms, 99)) if len(wait_ms) else 0.0,
+        }
+
+    def reset_metrics(self) -> None:
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+        self.busy = 0.0
+        self.started = time.perf_counter()
+        self.queue_wait.clear()
+
+
+if __name__ == "__main__":
+    # self-play games in threads, Q values of all of them go through one service
+    from Game import Game
+    from QLearningApproximationAgent import QLearningApproximationAgent
+    from EpsilonGreedyPolicy import EpsilonGreedyPolicy
+    from DeltaNumRowsFeatures import DeltaNumRowsFeatures
+    import argparse
+    import json
+    parser = argparse.ArgumentParser(description='Threaded self-play through QEvaluationService')
+    parser.add_argument("-t", "--threads", help="Concurrent games", type=int, default=8)
+    parser.add_argument("-g", "--games", help="Games per thread", type=int, default=2)
+    parser.add_argument("-b", "--max_batch", help="Max rows per batch", type=int, default=4096)
+    parser.add_argument("-w", "--max_wait", help="Max wait of a request in seconds", type=float, default=0.001)
+    args = parser.parse_args()
+
+    fm = DeltaNumRowsFeatures(5)
+    service = QEvaluationService(np.zeros(fm.features_count() + 1), args.max_batch, args.max_wait)
+
+    def self_play() -> None:
+        features = DeltaNumRowsFeatures(5)  # incremental features model keeps per-board state
+        for i in range(args.games):
+            a1 = QLearningApproximationAgent(0.5, 0.5, EpsilonGreedyPolicy(0.05), features, theta=service.theta, history='last', q_service=service)
+            a2 = QLearningApproximationAgent(0.5, 0.5, EpsilonGreedyPolicy(0.05), features, theta=service.theta, history='last', q_service=service)
+            Game(player1=a1, player2=a2, m=15, n=15, game_no=i)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=self_play) for _ in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    metrics = service.metrics()
+    metrics['games_per_sec'] = args.threads * args.games / (time.perf_counter() - start)
+    service.close()
+    print(json.dumps(metrics, indent=1))
@@ -1,17 +1,31 @@
-from base import Agent, Policy, Mark, Action, GameState, FeaturesModel
+from base import Agent, Policy, Mark, Action, GameState, FeaturesModel, dilate
+from ActionBatch import ActionBatch, ActionInfo
+from ReplayBuffer import ReplayBuffer
+from QEvaluationService import QEvaluationService
+from LRUCache import LRUCache
+from ZobristHash import ZobristHash
+from BoardSymmetry import BoardSymmetry
+from Profiler import profiler
 import numpy as np
-from typing import List, Optional, IO
+from typing import List, Optional, IO, Union, Deque, Tuple, Set
 import logging
-import random
-from dataclasses import dataclass
+import time
+from collections import deque
 
 
-@dataclass
-class ActionInfo:
-    action: Action
-    new_board: Optional[np.ndarray] = None
-    new_features: Optional[np.ndarray] = None
-    new_Q_value: Optional[float] = None
+def history_record_dtype(vector_len: int) -> np.dtype:
+    """
+    Record of the history file: kind 0 is a chosen action (row, col, Q value, features),
+    kind 1 is a theta snapshot (row and col are -1, value is nan)
+    """
+    return np.dtype([('kind', 'i1'), ('row', 'i4'), ('col', 'i4'), ('value', 'f8'), ('vector', 'f8', (vector_len,))])
+
+
+def read_history(filename: str, vector_len: int) -> np.ndarray:
+    """
+    Memory-maps history file written by agent with history='file'
+    """
+    return np.memmap(filename, dtype=history_record_dtype(vector_len), mode='r')
 
 
 class QLearningApproximationAgent(Agent):
@@ -25,19 +39,90 @@ class QLearningApproximationAgent(Agent):
                  learning: bool = True,
                  theta: Optional[np.ndarray] = None,
                  inf_field: bool = True,
-                 debug: bool = False
+                 debug: bool = False,
+                 history: str = 'all',
+                 history_size: int = 1,
+                 history_file: Optional[IO] = None,
+                 replay_buffer: Optional[ReplayBuffer] = None,
+                 features_cache: Optional[LRUCache] = None,
+                 q_cache: Optional[LRUCache] = None,
+                 canonical_cache: bool = False,
+                 time_budget: Optional[float] = None,
+                 priority_radius: int = 2,
+                 anytime_chunk: int = 32,
+                 q_service: Optional[QEvaluationService] = None,
+                 frontier_candidates: bool = False
                  ):
+        """
+        history is a policy of keeping chosen actions and theta snapshots:
+        'all' - keep everything in memory,
+        'last' - keep only the previous action needed for learning,
+        'ring' - keep the last history_size actions and theta snapshots,
+        'file' - keep the previous action and append every action and theta snapshot
+        to binary history_file (see history_record_dtype, read_history)
+        replay_buffer collects every learned transition for learn_replay/refit_replay
+        features_cache maps Zobrist hash of a candidate position to its features,
+        q_cache to its Q value and is dropped when theta changes;
+        caches are used only for states with hash (made by Game) and can be shared between games and agents,
+        keys include the features model (class and row) and row of the agent.
+        With canonical_cache caches are keyed by canonical hash over board symmetries,
+        so all symmetric positions share one entry; features are still computed on the real board,
+        so it is allowed only for features models which are symmetric (see FeaturesModel.symmetric),
+        e.g. SymmetricNumRowsFeatures
+        With time_budget (seconds) candidates are scored in chunks of anytime_chunk
+        in priority order (see prioritized_candidates) until the budget expires,
+        the move is chosen among the scored ones; at least one chunk is always scored
+        With frontier_candidates only empty cells near the stones (GameState.frontier made by Game)
+        are candidates, the most crowded first (after the priority of time_budget if it is set)
+        With q_service Q values are computed by the shared micro-batching service,
+        theta should be the service's theta so learning updates it in place
+        """
         self.alfa: float = alfa
         self.gamma: float = gamma
         self.policy: Policy = policy
         self.features_model: FeaturesModel = features_model
         self.is_learning: bool = learning
         self.row: int = row
-        self.history_actions: List[ActionInfo] = []
-        self.history_theta: List[np.ndarray] = []
+        self.history = history
+        self.history_file = history_file
+        self.history_actions: Union[List[ActionInfo], Deque[ActionInfo]]
+        self.history_theta: Union[List[np.ndarray], Deque[np.ndarray]]
+        if history == 'all':
+            self.history_actions = []
+            self.history_theta = []
+        elif history == 'last':
+            self.history_actions = deque(maxlen=1)
+            self.history_theta = deque(maxlen=0)
+        elif history == 'ring':
+            self.history_actions = deque(maxlen=history_size)
+            self.history_theta = deque(maxlen=history_size)
+        elif history == 'file':
+            if history_file is None:
+                raise ValueError('history_file is required for history=\'file\'')
+            self.history_actions = deque(maxlen=1)
+            self.history_theta = deque(maxlen=0)
+        else:
+            raise ValueError(f'Unknown history policy: {history}')
+        self.replay_buffer = replay_buffer
+        self.features_cache = features_cache
+        self.q_cache = q_cache
+        # agents with other features model or row must not hit entries of this one in a shared cache
+        self._cache_tag: Tuple = (features_model.__class__.__name__, getattr(features_model, 'row', None), row)
+        self.zobrist = ZobristHash()
+        if canonical_cache and not features_model.symmetric:
+            raise ValueError(f'canonical_cache requires symmetric features, {features_model.__class__.__name__} is not')
+        self.symmetry: Optional[BoardSymmetry] = BoardSymmetry(self.zobrist) if canonical_cache else None
         self.inf_field: bool = inf_field
         self.debug = debug
         self.reg = reg
+        self.time_budget = time_budget
+        self.priority_radius = priority_radius
+        self.anytime_chunk = anytime_chunk
+        self.q_service = q_service
+        self.frontier_candidates = frontier_candidates
+        self.seen_stones: Set[Tuple[int, int]] = set()
+        self.last_candidates: int = 0
+        self.last_evaluated: int = 0
 
         if theta is not None:
             self.theta = theta
@@ -48,80 +133,227 @@ class QLearningApproximationAgent(Agent):
         if self.debug:
             logging.info(f'{self.__class__.__name__}.get_action()')
 
-        actions = self.get_possible_actions(new_state)
+        actions = self.evaluate_actions(new_state)
         if self.debug:
             logging.info(f'Player: {new_state.current_player.name}')
             logging.info(f'\nPossible actions: {len(actions)}')
-            Q_table = new_state.board.copy().astype(dtype=np.object)
+            Q_table = new_state.board.copy().astype(dtype=object)
             Q_table[Q_table == Mark.X.value] = Mark.X.name
             Q_table[Q_table == Mark.O.value] = Mark.O.name
-
-        for a in actions:
-            if self.debug:
-                logging.info(f'Action: {a.action}')
-            a.new_board = new_state.board.copy()
-            a.new_board[a.action.row, a.action.col] = new_state.current_player.value
-            if self.debug:
-                logging.info(f'Board:\n{np.array2string(a.new_board, max_line_width=np.inf)}')
-            a.new_features = np.insert(self.features_model.get_features(GameState(a.new_board, new_state.current_player, new_state.is_game_end, new_state.winner)), 0, 1)
-
-            if self.debug:
-                logging.info(f'Features: {len(a.new_features)} {np.array2string(a.new_features, max_line_width=np.inf)}')
-            a.new_Q_value = np.dot(self.theta, a.new_features)
-            if self.debug:
-                logging.info(f'Q value: {a.new_Q_value}')
-                Q_table[a.action.row, a.action.col] = a.new_Q_value
+            for i in range(len(actions)):
+                logging.info(f'Action: {actions.action(i)}')
+                logging.info(f'Features: {actions.features.shape[1]} {np.array2string(actions.features[i], max_line_width=np.inf)}')
+                logging.info(f'Q value: {actions.Q[i]}')
+                Q_table[actions.rows[i], actions.cols[i]] = actions.Q[i]
 
         if self.debug:
             logging.info(f'Q table:\n{np.array2string(Q_table, max_line_width=np.inf)}')
 
         if len(self.history_actions) > 0 and self.is_learning is not None:
             reward = -1
-            self.learn(self.history_actions[-1], actions, reward)
+            with profiler.timer('agent.learn'):
+                self.learn(self.history_actions[-1], actions, reward)
 
-        action = self.policy.get_action(new_state, actions)
+        with profiler.timer('agent.policy'):
+            action = self.action_info(actions, self.policy.get_action(new_state, actions))
 
         if self.debug:
-            logging.info(f'Action: {action.action}')
-        
+            logging.info(f'Action: {action.action}, evaluated {self.last_evaluated} of {self.last_candidates} candidates')
+
         self.history_actions.append(action)
+        if self.history_file is not None:
+            self.write_history(0, action.action.row, action.action.col, action.new_Q_value, action.new_features)
 
         return action.action
-    
-    def get_actions_features(self, state: GameState, actions: List[ActionInfo]) -> List[ActionInfo]:
-        for a in actions:
-            a.new_board = state.board.copy()
-            a.new_board[a.action.row, a.action.col] = state.current_player.value
-            a.new_features = self.features_model.get_features(GameState(a.new_board, state.current_player, state.is_game_end, state.winner))
+
+    def action_info(self, actions: ActionBatch, i: int) -> ActionInfo:
+        # features are copied, a view would keep the whole batch alive in history
+        return ActionInfo(action=actions.action(i), new_features=actions.features[i].copy(), new_Q_value=float(actions.Q[i]))
+
+    def evaluate_actions(self, state: GameState) -> ActionBatch:
+        """
+        Builds one (candidates x features) matrix for all empty cells
+        and scores all of them with a single matrix-vector product.
+        With time_budget only candidates scored before the deadline are returned
+        """
+        deadline = time.perf_counter() + self.time_budget if self.time_budget is not None else None
+        with profiler.timer('agent.candidates'):
+            rows = cols = np.zeros(0, dtype=np.intp)
+            if self.frontier_candidates and state.frontier is not None:
+                rows, cols = state.frontier.candidates(state.origin, state.board.shape)
+                if deadline is not None and len(rows) > 0:
+                    # cells near the most recent stones first, the most crowded first among equals
+                    order = np.argsort(self.candidate_priority(state)[rows, cols], kind='stable')
+                    rows, cols = rows[order], cols[order]
+            # empty board or no empty cells near the stones
+            if len(rows) == 0:
+                if deadline is None:
+                    rows, cols = np.where(state.board == Mark.NO.value)
+                else:
+                    rows, cols = self.prioritized_candidates(state)
+        profiler.count('agent.candidates', len(rows))
+        X = np.empty((len(rows), len(self.theta)))
+        Q = np.empty(len(rows))
+        n = len(rows)
+        if deadline is None:
+            Q[:] = self.score_candidates(state, rows, cols, X)
+        else:
+            step = self.anytime_chunk
+            for start in range(0, len(rows), step):
+                end = min(start + step, len(rows))
+                Q[start:end] = self.score_candidates(state, rows[start:end], cols[start:end], X[start:end])
+                n = end
+                if time.perf_counter() > deadline:
+                    break
+        profiler.count('agent.evaluated', n)
+        self.last_candidates = len(rows)
+        self.last_evaluated = n
+        return ActionBatch(rows[:n], cols[:n], X[:n], Q[:n])
+
+    def score_candidates(self, state: GameState, rows: np.ndarray, cols: np.ndarray, X: np.ndarray) -> np.ndarray:
+        """
+        Fills X with [1, features] of the candidates and returns their Q values
+        """
+        X[:, 0] = 1
+        if self.features_cache is None or (state.hash is None and self.symmetry is None):
+            with profiler.timer('agent.features'):
+                X[:, 1:] = self.features_model.get_features_batch(state, rows, cols)
+            with profiler.timer('agent.q_values'):
+                return self.predict_Q(X)
+
+        if self.symmetry is not None:
+            keys = self.canonical_candidate_keys(state, rows, cols)
+        else:
+            keys = [self.candidate_key(state, r, c) for r, c in zip(rows, cols)]
+        miss = []
+        for i, key in enumerate(keys):
+            features = self.features_cache.get(key)
+            if features is None:
+                miss.append(i)
+            else:
+                X[i, 1:] = features
+        with profiler.timer('agent.features'):
+            if len(miss) > 0:
+                X[miss, 1:] = self.features_model.get_features_batch(state, rows[miss], cols[miss])
+                for i in miss:
+                    self.features_cache.put(keys[i], X[i, 1:].copy())
+        with profiler.timer('agent.q_values'):
+            return self.cached_Q_values(keys, X)
+
+    def prioritized_candidates(self, state: GameState) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Empty cells in the order they are scored under time_budget, see candidate_priority
+        """
+        priority = self.candidate_priority(state)
+        rows, cols = np.nonzero(state.board == Mark.NO.value)
+        order = np.argsort(priority[rows, cols], kind='stable')
+        return rows[order], cols[order]
+
+    def candidate_priority(self, state: GameState) -> np.ndarray:
+        """
+        Priority of every cell, lower first: neighbours of stones placed since the previous call,
+        then by Chebyshev distance to the nearest stone up to priority_radius, then the rest
+        """
+        board = state.board
+        occupied = board != Mark.NO.value
+        # stones are remembered relative to origin, auto-extended board moves it
+        stones = set((int(r) - state.origin[0], int(c) - state.origin[1]) for r, c in np.argwhere(occupied))
+        recent = np.zeros(board.shape, dtype=bool)
+        for r, c in stones - self.seen_stones:
+            recent[r + state.origin[0], c + state.origin[1]] = True
+        self.seen_stones = stones
+
+        far = self.priority_radius + 1
+        priority = np.full(board.shape, far)
+        if not occupied.any():
+            priority[board.shape[0] // 2, board.shape[1] // 2] = 0
+        near = occupied
+        for d in range(1, far):
+            near = dilate(near)
+            priority[near & (priority == far)] = d
+        priority[dilate(recent)] = 0
+        return priority
+
+    def candidate_key(self, state: GameState, row: int, col: int) -> Tuple:
+        # features depend on borders too, so board geometry is a part of the key
+        assert state.hash is not None
+        h = state.hash ^ self.zobrist.side ^ self.zobrist.key(row - state.origin[0], col - state.origin[1], state.current_player.value)
+        return (h, state.board.shape, state.origin, self._cache_tag)
+
+    def canonical_candidate_keys(self, state: GameState, rows: np.ndarray, cols: np.ndarray) -> List[Tuple]:
+        # hashes of the position under every transform are computed once and updated by the candidate stone,
+        # the smallest one (the first transform on ties) is the canonical hash of the candidate position
+        assert self.symmetry is not None
+        shape = state.board.shape
+        transforms = self.symmetry.transforms(shape)
+        hashes = self.symmetry.hashes(state.board, state.current_player)
+        mark = state.current_player.value
+        children = np.empty((len(transforms), len(rows)), dtype=np.uint64)
+        for i, (t, h) in enumerate(zip(transforms, hashes)):
+            tr, tc = self.symmetry.transform_cell(rows, cols, shape, t)
+            children[i] = np.uint64(h ^ self.zobrist.side) ^ self.zobrist.keys(tr, tc, mark)
+        best = children.argmin(axis=0)
+        canonical = children[best, np.arange(len(rows))]
+        shapes = [self.symmetry.transform_shape(shape, t) for t in transforms]
+        return [(int(h), shapes[i], self._cache_tag) for h, i in zip(canonical.tolist(), best.tolist())]
+
+    def cached_Q_values(self, keys: List[Tuple], X: np.ndarray) -> np.ndarray:
+        if self.q_cache is None:
+            return self.predict_Q(X)
+        self.q_cache.invalidate(hash(self.theta.tobytes()))
+        Q = np.empty(len(keys))
+        miss = []
+        for i, key in enumerate(keys):
+            value = self.q_cache.get(key)
+            if value is None:
+                miss.append(i)
+            else:
+                Q[i] = value
+        if len(miss) > 0:
+            Q[miss] = self.predict_Q(X[miss])
+            for i in miss:
+                self.q_cache.put(keys[i], Q[i])
+        return Q
+
+    def predict_Q(self, X: np.ndarray) -> np.ndarray:
+        if self.q_service is not None:
+            return self.q_service.evaluate(X)
+        return np.dot(X, self.theta)
+
+    def get_actions_features(self, state: GameState, actions: ActionBatch) -> ActionBatch:
+        actions.features[:, 0] = 1
+        actions.features[:, 1:] = self.features_model.get_features_batch(state, actions.rows, actions.cols)
         return actions
 
-    def get_possible_actions(self, state: GameState) -> List[ActionInfo]:
-        f = np.where(state.board == Mark.NO.value)
-        possible_actions = [ActionInfo(action=Action(r, c)) for r, c in zip(f[0], f[1])]
-        return possible_actions
+    def get_possible_actions(self, state: GameState) -> ActionBatch:
+        rows, cols = np.where(state.board == Mark.NO.value)
+        return ActionBatch(rows, cols, np.zeros((len(rows), len(self.theta))), np.zeros(len(rows)))
 
-    def Q_values(self, actions: List[ActionInfo]) -> List[ActionInfo]:
-        for a in actions:
-            a.new_Q_value = np.dot(self.theta, a.new_features)
+    def Q_values(self, actions: ActionBatch) -> ActionBatch:
+        actions.Q[:] = self.predict_Q(actions.features)
         return actions
-    
-    def learn(self, prev_action: ActionInfo, actions: Optional[List[ActionInfo]], reward: float):
+
+    def learn(self, prev_action: ActionInfo, actions: Optional[ActionBatch], reward: float):
         if self.debug:
             logging.info(f'{self.__class__.__name__}.learn()')
         future_reward: float = 0
+        next_max_Q: float = 0
 
         if actions is not None:
             if self.debug:
                 logging.info('TD')
-            max_Q_value = np.max([a.new_Q_value for a in actions])
-            action = random.choice([a for a in actions if a.new_Q_value == max_Q_value])
-
-            assert action.new_Q_value is not None
-            future_reward = self.gamma * action.new_Q_value
+            next_max_Q = float(actions.Q.max())
+            future_reward = self.gamma * next_max_Q
         elif self.debug:
             logging.info('Terminal state')
 
-        self.history_theta.append(self.theta.copy())
+        if self.replay_buffer is not None:
+            self.replay_buffer.add(prev_action.new_features, reward, next_max_Q, actions is None)
+
+        if getattr(self.history_theta, 'maxlen', None) != 0:
+            self.history_theta.append(self.theta.copy())
+        if self.history_file is not None:
+            self.write_history(1, -1, -1, np.nan, self.theta)
         assert prev_action.new_Q_value is not None
         assert prev_action.new_features is not None
         if self.debug:
@@ -130,24 +362,84 @@ class QLearningApproximationAgent(Agent):
         current = prev_action.new_Q_value
 #        grad = -(expected - current) * prev_action.new_features
         X = prev_action.new_features
-        grad = -(expected - current) * np.dot(np.linalg.inv(np.dot(X.T, X) + self.reg * np.identity(len(X.T))), X.T).T
+        grad = -(expected - current) * self.regularized_direction(X)
         if self.debug:
             logging.info(f'expected: {expected}, current: {current}, features: {prev_action.new_features}')
         self.theta -= self.alfa * grad
         if self.debug:
             logging.info(f'New theta: {self.theta}')
 
+    def replay_targets(self, reward: np.ndarray, next_max_Q: np.ndarray, terminal: np.ndarray) -> np.ndarray:
+        return reward + self.gamma * np.where(terminal, 0, next_max_Q)
+
+    def learn_replay(self, batch_size: int) -> None:
+        """
+        TD update of theta from a minibatch of replay_buffer: ridge least-squares step
+        inv(X.T X + reg * I) X.T (expected - current) with the Gram matrix of the minibatch.
+        Unlike regularized_direction() of learn() it doesn't use the scalar X.X,
+        so a single-row batch doesn't give the same step as learn()
+        """
+        assert self.replay_buffer is not None
+        if len(self.replay_buffer) == 0:
+            return
+        X, reward, next_max_Q, terminal = self.replay_buffer.sample(batch_size)
+        errors = self.replay_targets(reward, next_max_Q, terminal) - np.dot(X, self.theta)
+        step = np.linalg.solve(np.dot(X.T, X) + self.reg * np.identity(X.shape[1]), np.dot(X.T, errors))
+        self.theta += self.alfa * step
+
+    def refit_replay(self) -> None:
+        """
+        Ridge least-squares refit of theta over the whole replay_buffer
+        """
+        assert self.replay_buffer is not None
+        if len(self.replay_buffer) == 0:
+            return
+        X, reward, next_max_Q, terminal = self.replay_buffer.all()
+        expected = self.replay_targets(reward, next_max_Q, terminal)
+        self.theta[:] = np.linalg.solve(np.dot(X.T, X) + self.reg * np.identity(X.shape[1]), np.dot(X.T, expected))
+
+    def write_history(self, kind: int, row: int, col: int, value: float, vector: np.ndarray) -> None:
+        record = np.zeros(1, dtype=history_record_dtype(len(self.theta)))
+        record[0] = (kind, row, col, value, vector)
+        self.history_file.write(record.tobytes())
+
+    def regularized_direction(self, X: np.ndarray) -> np.ndarray:
+        """
+        Closed form of inv(X.T X + reg * I) X.T for 1-D features vector X.
+        X.T X is the scalar s = X.X, added to every element: s * 1 1.T + reg * I,
+        so by Sherman-Morrison the inverse applied to X is
+        (X - s * sum(X) / (reg + s * F)) / reg, O(F) instead of O(F^3)
+        """
+        s = np.dot(X, X)
+        return (X - s * X.sum() / (self.reg + s * len(X))) / self.reg
+
+    def regularized_direction_inv(self, X: np.ndarray) -> np.ndarray:
+        """
+        Original formula with explicit inversion, kept for validation
+        """
+        return np.dot(np.linalg.inv(np.dot(X.T, X) + self.reg * np.identity(len(X.T))), X.T).T
+
     def loss(self, state):
+        self.seen_stones = set()
         if self.is_learning:
-            self.learn(self.history_actions[-1], None, -100)
+            with profiler.timer('agent.learn'):
+                self.learn(self.history_actions[-1], None, -100)
 
     def win(self, state):
+        self.seen_stones = set()
         if self.is_learning:
-            self.learn(self.history_actions[-1], None, 100)
+            with profiler.timer('agent.learn'):
+                self.learn(self.history_actions[-1], None, 100)
 
     def draw(self, state):
+        self.seen_stones = set()
         if self.is_learning:
-            self.learn(self.history_actions[-1], None, -20)
+            with profiler.timer('agent.learn'):
+                self.learn(self.history_actions[-1], None, -20)
 
     def get_learn_params(self) -> str:
         return str(list(self.theta))
+
+    def get_learn_array(self) -> Optional[np.ndarray]:
+        return self.theta
+
@@ -0,0 +1,40 @@
+import numpy as np
+from typing import Optional, Tuple
+
+
+class ReplayBuffer:
+    """
+    Experience replay of TD transitions in preallocated arrays.
+    Transition is features of the chosen action, reward, max Q value of the next state
+    (at the moment of collection) and terminal flag.
+    When capacity is reached the oldest transitions are overwritten.
+    """
+    def __init__(self, capacity: int, features_len: int, seed: Optional[int] = None):
+        self.capacity = capacity
+        self.features = np.zeros((capacity, features_len), dtype=np.float64)
+        self.reward = np.zeros(capacity, dtype=np.float64)
+        self.next_max_Q = np.zeros(capacity, dtype=np.float64)
+        self.terminal = np.zeros(capacity, dtype=bool)
+        self.size = 0
+        self.pos = 0
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(self, features: np.ndarray, reward: float, next_max_Q: float, terminal: bool) -> None:
+        i = self.pos
+        self.features[i] = features
+        self.reward[i] = reward
+        self.next_max_Q[i] = next_max_Q
+        self.terminal[i] = terminal
+        self.pos = (self.pos + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def sample(self, batch_size: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        idx = self.rng.integers(0, self.size, min(batch_size, self.size))
+        return self.features[idx], self.reward[idx], self.next_max_Q[idx], self.terminal[idx]
+
+    def all(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        n = self.size
+        return self.features[:n], self.reward[:n], self.next_max_Q[:n], self.terminal[:n]
@@ -0,0 +1,33 @@
+from base import Policy, GameState
+from ActionBatch import ActionBatch
+import numpy as np
+from typing import Optional
+import logging
+
+
+class SoftmaxPolicy(Policy):
+    """
+    Boltzmann exploration: action i is chosen with probability proportional to exp(Q[i] / temperature)
+    """
+    def __init__(self, temperature: float = 1.0, seed: Optional[int] = None, debug: bool = False):
+        if temperature <= 0:
+            raise ValueError('temperature must be positive')
+        self.temperature = temperature
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.debug = debug
+
+    def probabilities(self, actions: ActionBatch) -> np.ndarray:
+        weights = np.exp((actions.Q - actions.Q.max()) / self.temperature)
+        return weights / weights.sum()
+
+    def get_action(self, state: GameState, actions: ActionBatch) -> int:
+        """
+        Index of the chosen action
+        """
+        p = self.probabilities(actions)
+        i = int(np.searchsorted(np.cumsum(p), self.rng.random() * p.sum(), side='right'))
+        i = min(i, len(actions) - 1)
+        if self.debug:
+            logging.info(f'{self.__class__.__name__}.get_action(): {i} of {len(actions)}, p = {p[i]}')
+        return i
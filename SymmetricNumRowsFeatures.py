@@ -0,0 +1,22 @@
+from VectorNumRowsFeatures import VectorNumRowsFeatures
+from BoardSymmetry import BoardSymmetry
+from base import Mark
+import numpy as np
+
+
+class SymmetricNumRowsFeatures(VectorNumRowsFeatures):
+    """
+    NumRowsFeatures of the canonical orientation of the board (see BoardSymmetry.canonical),
+    so all rotations and reflections of a position have the same features.
+    The walk of find_rows depends on the direction, plain NumRowsFeatures differ between orientations.
+    Allows canonical_cache of QLearningApproximationAgent.
+    """
+    symmetric = True
+
+    def __init__(self, row=5, chunk: int = 256):
+        super().__init__(row, chunk)
+        self.symmetry = BoardSymmetry()
+
+    def get_features_stack(self, boards: np.ndarray, current_player: Mark) -> np.ndarray:
+        canonical, _ = self.symmetry.canonical_stack(boards)
+        return super().get_features_stack(canonical, current_player)
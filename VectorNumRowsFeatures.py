@@ -0,0 +1,175 @@
+from NumRowsFeatures import NumRowsFeatures, Feature
+from base import GameState, Mark
+from Profiler import profiler
+from numpy.lib.stride_tricks import as_strided, sliding_window_view
+import numpy as np
+from typing import List
+
+BORDER = 3  # sentinel value of cells outside of the board
+
+
+class VectorNumRowsFeatures(NumRowsFeatures):
+    """
+    NumRowsFeatures computed with array operations over a stack of boards.
+    Each direction is a set of lines (rows, columns, diagonals as strided views of a padded board),
+    forward/backward windows of every cell are sliding window views of the lines,
+    so the walk of find_rows from every stone is evaluated for all cells at once.
+    Only the choice of stones which start a walk (the ones not visited by an earlier walk)
+    is a loop over positions along the lines, vectorized over all lines and boards.
+    """
+    def __init__(self, row=5, chunk: int = 256):
+        super().__init__(row)
+        self.chunk = chunk
+        self.pad = row + 1
+        # feature index by (1 for current player's stones or 2 for enemy's, count, enemy_behind)
+        self._feature_table = np.full((3, row + 1, 2), -1, dtype=np.intp)
+        for i, name in enumerate(self._feature_names):
+            if isinstance(name, Feature):
+                self._feature_table[name.mark, name.row, int(name.enemy_behind)] = i
+        self._alone_count_i = self._feature_names.index('alone_count')
+        self._alone_alone_i = self._feature_names.index('alone_alone')
+
+    def get_features(self, state: GameState) -> np.ndarray:
+        profiler.count('features.get_features')
+        return self.get_features_stack(state.board[np.newaxis], state.current_player)[0]
+
+    def get_features_batch(self, state: GameState, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """
+        Features of all candidate boards, scored as stacks of chunk boards
+        """
+        batch = np.empty((len(rows), self.features_count()), dtype=int)
+        for start in range(0, len(rows), self.chunk):
+            r = np.asarray(rows[start:start + self.chunk])
+            c = np.asarray(cols[start:start + self.chunk])
+            stack = np.repeat(state.board[np.newaxis], len(r), axis=0)
+            stack[np.arange(len(r)), r, c] = state.current_player.value
+            batch[start:start + len(r)] = self.get_features_stack(stack, state.current_player)
+        return batch
+
+    def get_features_stack(self, boards: np.ndarray, current_player: Mark) -> np.ndarray:
+        """
+        Features of every board of (boards x height x width) stack, current_player is the same for all of them
+        """
+        boards = boards.astype(np.int8, copy=False)
+        features = np.zeros((len(boards), self.features_count()), dtype=int)
+        for lines in self.lines(boards):
+            features += self.lines_features(lines, current_player.value)
+
+        occupied = boards != Mark.NO.value
+        stones = occupied.sum(axis=(1, 2))
+        b, h, w = occupied.shape
+        padded = np.zeros((b, h + 2, w + 2), dtype=np.int8)
+        padded[:, 1:-1, 1:-1] = occupied
+        neighbours = sliding_window_view(padded, (3, 3), axis=(1, 2)).sum(axis=(3, 4)) - occupied
+        features[:, self._alone_count_i] = np.count_nonzero(occupied & (neighbours == 0), axis=(1, 2))
+        # see NumRowsFeatures.get_features: is_alone is asked only when no stone has a neighbour
+        # and there are no rows, so alone_alone is 1 for empty board and single stone only
+        features[:, self._alone_alone_i] = stones <= 1
+        return features
+
+    def lines(self, boards: np.ndarray) -> List[np.ndarray]:
+        """
+        (boards x lines x cells) arrays of the four directions of find_rows, cells in the order of its walk,
+        padded with BORDER on both ends
+        """
+        pad = self.pad
+        b, h, w = boards.shape
+        padded = np.full((b, h + 2 * pad, w + 2 * pad), BORDER, dtype=np.int8)
+        padded[:, pad:pad + h, pad:pad + w] = boards
+        return [
+            padded[:, pad:pad + h, :],  # (0, 1)
+            padded[:, :, pad:pad + w].transpose(0, 2, 1),  # (1, 0)
+            self.diagonals(boards),  # (1, 1)
+            self.diagonals(boards[:, :, ::-1]),  # (1, -1) is (1, 1) of mirrored board
+        ]
+
+    def diagonals(self, boards: np.ndarray) -> np.ndarray:
+        # board cell (r, c) is skewed to (pad + r, pad + h - 1 + c),
+        # then line k is the strided view of cells (t, t + k)
+        pad = self.pad
+        b, h, w = boards.shape
+        skewed = np.full((b, h + 2 * pad, 2 * h + w + 2 * pad - 2), BORDER, dtype=np.int8)
+        skewed[:, pad:pad + h, pad + h - 1:pad + h - 1 + w] = boards
+        s_b, s_r, s_c = skewed.strides
+        return as_strided(skewed, shape=(b, h + w - 1, h + 2 * pad), strides=(s_b, s_c, s_r + s_c), writeable=False)
+
+    def lines_features(self, lines: np.ndarray, curr_value: int) -> np.ndarray:
+        """
+        Row features of (boards x lines x cells) array, counts per board
+        """
+        k = self.row
+        pad = self.pad
+        length = lines.shape[2] - 2 * pad
+
+        marks = lines[:, :, pad:pad + length]
+        stones = (marks == Mark.X.value) | (marks == Mark.O.value)
+        at = np.nonzero(stones)
+        m = marks[at]
+        # forward[i, j] is the cell j steps after i-th stone, backward[i, j] j steps before it
+        forward = sliding_window_view(lines, k, axis=2)[:, :, pad:pad + length][at]
+        backward = sliding_window_view(lines, k + 1, axis=2)[:, :, pad - k:pad - k + length][at][:, ::-1]
+        rows = np.arange(len(m))
+
+        # look forward: the walk stops on enemy or border, or after k cells
+        j = np.arange(k)
+        blocked = (forward != m[:, np.newaxis]) & (forward != Mark.NO.value) & (j > 0)
+        first_blocked = np.where(blocked.any(axis=1), blocked.argmax(axis=1), k)
+        last = np.minimum(k - 1, first_blocked - 1)
+        steal = forward[rows, last] == m
+        enemy_behind = (first_blocked < k) & steal
+        cnt = 1 + np.count_nonzero((forward == m[:, np.newaxis]) & (j > 0) & (j <= last[:, np.newaxis]), axis=1)
+        s = last + 1
+
+        # look backward: at least one cell, then until the walk covers k cells
+        j = np.arange(k + 1)
+        blocked = (backward != m[:, np.newaxis]) & (backward != Mark.NO.value) & (j > 0)
+        first_blocked = np.where(blocked.any(axis=1), blocked.argmax(axis=1), k + 1)
+        need = np.maximum(k - s, 1)
+        taken = np.minimum(need, first_blocked - 1)
+        stop = backward[rows, np.minimum(first_blocked, k)]
+        enemy_behind |= (first_blocked - 1 < need) & (stop == BORDER) & steal
+        before = backward[:, 1]
+        enemy_behind |= (before != Mark.NO.value) & (before != m) & (before != BORDER)
+        cnt += np.count_nonzero((backward == m[:, np.newaxis]) & (j > 0) & (j <= taken[:, np.newaxis]), axis=1)
+        s = s + taken
+
+        reach_back = np.zeros(marks.shape, dtype=np.intp)
+        reach_back[at] = first_blocked
+        starts = self.walk_starts(stones, reach_back)[at]
+
+        cnt = np.minimum(cnt, k)
+        enemy_behind &= cnt < k
+        counted = starts & (s >= k) & (cnt > 1)
+        mark = np.where(m[counted] == curr_value, 1, 2)
+        index = self._feature_table[mark, cnt[counted], enemy_behind[counted].astype(np.intp)]
+        counts = np.zeros((lines.shape[0], self.features_count()), dtype=int)
+        np.add.at(counts, (at[0][counted], index), 1)
+        return counts
+
+    def walk_starts(self, stones: np.ndarray, reach_back: np.ndarray) -> np.ndarray:
+        """
+        Stones which start a walk: not reached by the forward walk of an earlier start,
+        i.e. no start among k - 1 previous cells closer than reach_back (first enemy or border behind)
+        """
+        k = self.row
+        length = stones.shape[2]
+        starts = np.zeros(stones.shape[:2] + (length + k - 1,), dtype=bool)
+        j = np.arange(k - 1, 0, -1)  # distance back to cells starts[..., p:p + k - 1]
+        for p in range(length):
+            covered = (starts[:, :, p:p + k - 1] & (j < reach_back[:, :, p, np.newaxis])).any(axis=-1)
+            starts[:, :, p + k - 1] = stones[:, :, p] & ~covered
+        return starts[:, :, k - 1:]
+
+
+if __name__ == "__main__":
+    # timing against the loop implementation, equivalence is checked by tests/test_vector_features.py
+    import time
+    rng = np.random.default_rng(0)
+    for size in [15, 19, 31]:
+        board = np.where(rng.random((size, size)) < 0.3, rng.integers(1, 3, (size, size)), 0).astype(np.int8)
+        state = GameState(board, Mark.X, False, Mark.NO)
+        rows, cols = np.nonzero(board == Mark.NO.value)
+        for model in [NumRowsFeatures(5), VectorNumRowsFeatures(5)]:
+            start = time.perf_counter()
+            model.get_features_batch(state, rows, cols)
+            print(f'{size}x{size} {len(rows)} candidates {model.__class__.__name__}: {time.perf_counter() - start:.3f}s')
@@ -0,0 +1,54 @@
+from base import Mark
+import numpy as np
+from typing import Tuple
+
+
+MASK64 = (1 << 64) - 1
+
+
+def splitmix64(x: int) -> int:
+    x = (x + 0x9E3779B97F4A7C15) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+
+def splitmix64_array(x: np.ndarray) -> np.ndarray:
+    # uint64 arithmetic wraps around, same as masking in splitmix64
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+class ZobristHash:
+    """
+    Zobrist keys for cells of an unbounded board.
+    Keys are computed from (row, col, mark) by a mixing function instead of a random table,
+    so they are the same in every game and process and work for negative coordinates
+    of the auto-extended board. Coordinates are absolute: logical board position minus origin.
+    """
+    def __init__(self, seed: int = 0):
+        self.seed = seed
+        self.side: int = splitmix64(seed ^ 0x5851F42D4C957F2D)
+
+    def key(self, row: int, col: int, mark: int) -> int:
+        return splitmix64(self.seed ^ ((int(row) & 0xFFFFFF) << 34) ^ ((int(col) & 0xFFFFFF) << 8) ^ int(mark))
+
+    def keys(self, rows: np.ndarray, cols: np.ndarray, mark: int) -> np.ndarray:
+        """
+        key() of many cells at once, as uint64 array
+        """
+        rows = np.asarray(rows, dtype=np.int64).astype(np.uint64) & np.uint64(0xFFFFFF)
+        cols = np.asarray(cols, dtype=np.int64).astype(np.uint64) & np.uint64(0xFFFFFF)
+        x = np.uint64(self.seed) ^ (rows << np.uint64(34)) ^ (cols << np.uint64(8)) ^ np.uint64(mark)
+        return splitmix64_array(x)
+
+    def hash_board(self, board: np.ndarray, current_player: Mark, origin: Tuple[int, int] = (0, 0)) -> int:
+        """
+        Hash of the position from scratch, side key is included when O is to move
+        """
+        h = self.side if current_player == Mark.O else 0
+        for r, c in zip(*np.nonzero(board != Mark.NO.value)):
+            h ^= self.key(int(r) - origin[0], int(c) - origin[1], int(board[r, c]))
+        return h
@@ -3,7 +3,10 @@ from enum import Enum
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 import numpy as np
-from typing import List, Tuple, Any, Optional, Callable, NamedTuple
+from typing import List, Tuple, Any, Optional, Callable, NamedTuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from FrontierIndex import FrontierIndex
 
 
 class Mark(Enum):
@@ -17,12 +20,66 @@ class Action(NamedTuple):
     col: int
 
 
+def is_win_at(board: np.ndarray, row: int, col: int, k: int) -> bool:
+    """
+    Whether the stone on (row, col) is a part of k in a row,
+    only four lines through the cell are checked, at most 2k-1 cells in each direction
+    """
+    h, w = board.shape
+    mark = board[row, col]
+    if mark == Mark.NO.value:
+        return False
+    for d_r, d_c in [(0, 1), (1, 1), (1, 0), (1, -1)]:
+        count = 1
+        r, c = row + d_r, col + d_c
+        while 0 <= r < h and 0 <= c < w and board[r, c] == mark and count < k:
+            count += 1
+            r += d_r
+            c += d_c
+        r, c = row - d_r, col - d_c
+        while 0 <= r < h and 0 <= c < w and board[r, c] == mark and count < k:
+            count += 1
+            r -= d_r
+            c -= d_c
+        if count >= k:
+            return True
+    return False
+
+
+def dilate(mask: np.ndarray, radius: int = 1) -> np.ndarray:
+    """
+    Cells within Chebyshev radius of any True cell of the mask
+    """
+    h, w = mask.shape
+    padded = np.zeros((h + 2 * radius, w + 2 * radius), dtype=bool)
+    padded[radius:radius + h, radius:radius + w] = mask
+    result = np.zeros((h, w), dtype=bool)
+    for dr in range(2 * radius + 1):
+        for dc in range(2 * radius + 1):
+            result |= padded[dr:dr + h, dc:dc + w]
+    return result
+
+
+def near_cells(board: np.ndarray, radius: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Empty cells within Chebyshev radius of any stone, center of the board if it is empty
+    """
+    occupied = board != Mark.NO.value
+    h, w = occupied.shape
+    if not occupied.any():
+        return np.array([h // 2]), np.array([w // 2])
+    return np.nonzero(dilate(occupied, radius) & ~occupied)
+
+
 @dataclass
 class GameState:
     board: np.ndarray
     current_player: Mark
     is_game_end: bool
     winner: Mark
+    hash: Optional[int] = None  # Zobrist hash of the position with side to move
+    origin: Tuple[int, int] = (0, 0)  # logical position of the initial board on auto-extended board
+    frontier: Optional[FrontierIndex] = None  # index of the stones, Game.state_view() shares the live one
 
     def __str__(self) -> str:
         s = f'current_player: {self.current_player.name}\n'
@@ -67,6 +124,12 @@ class Agent(ABC):
     def get_learn_params(self) -> str:
         pass
 
+    def get_learn_array(self) -> Optional[np.ndarray]:
+        """
+        Learned parameters as array for binary logs, None if agent doesn't learn
+        """
+        return None
+
 
 @dataclass
 class Player:
@@ -85,6 +148,10 @@ class Policy(ABC):
 
 
 class FeaturesModel(ABC):
+    # features don't change under rotations and reflections of the board,
+    # required by canonical_cache of QLearningApproximationAgent
+    symmetric: bool = False
+
     @abstractmethod
     def __init__(self):
         pass
@@ -97,6 +164,20 @@ class FeaturesModel(ABC):
     def features_count(self) -> int:
         pass
 
+    def get_features_batch(self, state: GameState, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """
+        Features after current player places a stone on (rows[i], cols[i]),
+        one row of the matrix per candidate
+        """
+        board = state.board.copy()
+        batch = np.zeros((len(rows), self.features_count()))
+        candidate = GameState(board, state.current_player, state.is_game_end, state.winner)
+        for i, (r, c) in enumerate(zip(rows, cols)):
+            board[r, c] = state.current_player.value
+            batch[i] = self.get_features(candidate)
+            board[r, c] = Mark.NO.value
+        return batch
+
     @abstractmethod
     def feature_names(self) -> List[Any]:
         pass
@@ -0,0 +1,237 @@
+import numpy as np
+from Game import Game
+from ConsoleHumanAgent import ConsoleHumanAgent
+from QLearningApproximationAgent import QLearningApproximationAgent
+from EpsilonGreedyPolicy import EpsilonGreedyPolicy
+from NumRowsFeatures import NumRowsFeatures
+from DeltaNumRowsFeatures import DeltaNumRowsFeatures
+from CartNumRowsFeatures import CartNumRowsFeatures
+from VectorNumRowsFeatures import VectorNumRowsFeatures
+from MCTSAgent import MCTSAgent
+from base import GameState, Mark, FeaturesModel
+import argparse
+import json
+import platform
+import sys
+import time
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+BOARDS: List[Tuple[str, Optional[int], Optional[int]]] = [('15x15', 15, 15), ('inf', None, None)]
+ROWS = [4, 5]
+DENSITIES = [0.1, 0.3]
+
+
+def measure(fn: Callable[[], Any], repeat: int, number: int) -> Dict[str, float]:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+    return {'min': min(times), 'median': float(np.median(times)), 'calls': repeat * number}
+
+
+def measure_between(setup: Callable[[], Any], fn: Callable[[], Any], teardown: Callable[[], Any],
+                    repeat: int, number: int) -> Dict[str, float]:
+    """
+    measure() of fn only, setup and teardown around every call are not timed
+    """
+    times = []
+    for _ in range(repeat):
+        total = 0.0
+        for _ in range(number):
+            setup()
+            start = time.perf_counter()
+            fn()
+            total += time.perf_counter() - start
+            teardown()
+        times.append(total / number)
+    return {'min': min(times), 'median': float(np.median(times)), 'calls': repeat * number}
+
+
+def make_game(m: Optional[int], n: Optional[int], k: int, density: float, seed: int) -> Game:
+    """
+    Game with seeded random stones, no win check is done while placing them.
+    Infinite board is extended after every stone, like in a real game.
+    """
+    rng = np.random.default_rng(seed)
+    g = Game(ConsoleHumanAgent(), ConsoleHumanAgent(), m=m, n=n, k=k, play=False)
+    stones = int(density * 15 * 15)
+    mark = Mark.O if m is None else Mark.X
+    placed = int(np.count_nonzero(g.board != Mark.NO.value))
+    while placed < stones:
+        if m is None:
+            # grow infinite board around existing stones
+            occupied = np.argwhere(g.board != Mark.NO.value)
+            r, c = occupied[rng.integers(len(occupied))] + rng.integers(-2, 3, 2)
+        else:
+            r, c = rng.integers(0, g.board.shape[0]), rng.integers(0, g.board.shape[1])
+        if g.board[r, c] != Mark.NO.value:
+            continue
+        g.grid.set(r, c, mark.value)
+        if m is None:
+            g.extend_board()
+        mark = Mark.O if mark == Mark.X else Mark.X
+        placed += 1
+    return g
+
+
+def agent_for(features_model: FeaturesModel, k: int) -> QLearningApproximationAgent:
+    theta = np.random.default_rng(0).normal(size=features_model.features_count() + 1)
+    return QLearningApproximationAgent(0.5, 0.5, EpsilonGreedyPolicy(0.05, seed=0), features_model, row=k, theta=theta, history='last')
+
+
+def run(quick: bool) -> List[Dict[str, Any]]:
+    repeat = 3 if quick else 7
+    results: List[Dict[str, Any]] = []
+
+    def add(name: str, params: Dict[str, Any], timing: Dict[str, float]) -> None:
+        results.append({'name': name, 'params': params, **timing})
+        print(f"{name:40} {json.dumps(params):75} {timing['min'] * 1e3:10.3f} ms", file=sys.stderr)
+
+    for board_name, m, n in BOARDS:
+        for k in ROWS:
+            for density in DENSITIES:
+                params = {'board': board_name, 'k': k, 'density': density}
+                g = make_game(m, n, k, density, seed=k)
+                state = GameState(g.board.copy(), Mark.X, False, Mark.NO)
+                # win check through the last placed stone
+                r, c = (int(x) for x in np.argwhere(state.board != Mark.NO.value)[-1])
+
+                add('Game.check_win', params, measure(g.check_win, repeat, 10))
+                add('Game.check_win_at', params, measure(lambda: g.check_win_at(r, c), repeat, 1000))
+
+                nf = NumRowsFeatures(k)
+                add('NumRowsFeatures.get_features', params, measure(lambda: nf.get_features(state), repeat, 10))
+                cf = CartNumRowsFeatures(k)
+                add('CartNumRowsFeatures.get_features', params, measure(lambda: cf.get_features(state), repeat, 10))
+                vf = VectorNumRowsFeatures(k)
+                add('VectorNumRowsFeatures.get_features', params, measure(lambda: vf.get_features(state), repeat, 10))
+
+                for fm in [NumRowsFeatures(k), DeltaNumRowsFeatures(k), VectorNumRowsFeatures(k)]:
+                    agent = agent_for(fm, k)
+
+                    def get_action() -> None:
+                        agent.history_actions.clear()
+                        agent.get_action(state)
+
+                    fm_params = {**params, 'features': fm.__class__.__name__}
+                    add('Agent.get_action', fm_params, measure(get_action, repeat, 1))
+
+                    actions = agent.evaluate_actions(state)
+                    theta = agent.theta.copy()
+
+                    def learn() -> None:
+                        agent.theta[:] = theta
+                        agent.learn(agent.action_info(actions, 0), actions, -1)
+
+                    add('Agent.learn', fm_params, measure(learn, repeat, 100))
+
+                # extension of the infinite board after a stone is placed on its edge,
+                # the board is shrunk back between the calls
+                if m is None:
+                    geometry = g.grid.geometry()
+                    bitboard = g.bitboard
+                    edge = (0, int(np.argwhere(g.board != Mark.NO.value)[0][1]))
+
+                    def place_on_edge() -> None:
+                        g.grid.set(*edge, Mark.X.value)
+
+                    def shrink() -> None:
+                        # edge is in coordinates of the board before the extension,
+                        # restore() also resets the bounding box of the stones
+                        g.board = g.grid.restore(geometry)
+                        g.grid.set(*edge, Mark.NO.value)
+                        g.bitboard = bitboard
+
+                    add('Game.extend_board', params, measure_between(place_on_edge, g.extend_board, shrink, repeat, 100))
+
+    # MCTS scaling with root-parallel workers, every worker runs all playouts on its own tree
+    fm = DeltaNumRowsFeatures(5)
+    g = make_game(15, 15, 5, 0.1, seed=5)
+    state = GameState(g.board.copy(), Mark.X, False, Mark.NO)
+    theta = np.random.default_rng(0).normal(size=fm.features_count() + 1)
+    playouts = 80 if quick else 400
+    for workers in [1, 2, 4]:
+        with MCTSAgent(theta, fm, time_budget=None, playouts=playouts, workers=workers, reuse_tree=False, seed=0) as mcts:
+            mcts.get_action(state)  # starts the pool
+            timing = measure(lambda: mcts.get_action(state), repeat, 1)
+            timing['playouts_per_sec'] = mcts.last_playouts / timing['min']
+            add('MCTSAgent.get_action', {'board': '15x15', 'k': 5, 'workers': workers}, timing)
+            print(f"{'':40} {workers} workers: {timing['playouts_per_sec']:.0f} playouts/sec", file=sys.stderr)
+
+    # end-to-end self-play, seeded
+    for board_name, m, n in BOARDS:
+        for k in ROWS:
+            params = {'board': board_name, 'k': k}
+            fm = DeltaNumRowsFeatures(k)
+            games = 2 if quick else 5
+
+            def self_play() -> None:
+                theta = np.zeros(fm.features_count() + 1)
+                for i in range(games):
+                    a1 = QLearningApproximationAgent(0.5, 0.5, EpsilonGreedyPolicy(0.05, seed=2 * i), fm, row=k, theta=theta, history='last')
+                    a2 = QLearningApproximationAgent(0.5, 0.5, EpsilonGreedyPolicy(0.05, seed=2 * i + 1), fm, row=k, theta=theta, history='last')
+                    Game(player1=a1, player2=a2, m=m, n=n, k=k, game_no=i)
+
+            timing = measure(self_play, 1 if quick else 3, 1)
+            timing['games_per_sec'] = games / timing['min']
+            add('self-play games', params, timing)
+
+    return results
+
+
+def key(result: Dict[str, Any]) -> str:
+    return result['name'] + ' ' + json.dumps(result['params'], sort_keys=True)
+
+
+def compare(old_filename: str, new_filename: str, threshold: float) -> bool:
+    """
+    Prints time ratio new/old for every benchmark, returns False if any of them regressed
+    """
+    with open(old_filename) as f:
+        old = dict((key(r), r) for r in json.load(f)['results'])
+    with open(new_filename) as f:
+        new = dict((key(r), r) for r in json.load(f)['results'])
+
+    ok = True
+    for k in sorted(set(old) & set(new)):
+        ratio = new[k]['min'] / old[k]['min'] if old[k]['min'] > 0 else float('inf')
+        mark = ''
+        if ratio > 1 + threshold:
+            mark = 'REGRESSION'
+            ok = False
+        elif ratio < 1 - threshold:
+            mark = 'improvement'
+        print(f'{ratio:7.2f}x {mark:12} {k}')
+    for k in sorted(set(old) ^ set(new)):
+        print(f'{"":7}  {"missing":12} {k}')
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='m,n,k-game benchmarks')
+    parser.add_argument("-o", "--output", help="Write results to JSON file", type=str)
+    parser.add_argument("-q", "--quick", help="Fewer repeats", action='store_true')
+    parser.add_argument("-c", "--compare", help="Compare two result files: OLD NEW", nargs=2, type=str)
+    parser.add_argument("-t", "--threshold", help="Relative slowdown reported as regression", type=float, default=0.1)
+    args = parser.parse_args()
+
+    if args.compare is not None:
+        sys.exit(0 if compare(args.compare[0], args.compare[1], args.threshold) else 1)
+
+    results = run(args.quick)
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+    else:
+        print(json.dumps(report, indent=1))
@@ -0,0 +1,128 @@
+from GameServer import GameServer
+import numpy as np
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+
+class Client:
+    """
+    One connection to GameServer, requests are pipelined and matched to replies by id
+    """
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.next_id = 0
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.receiver = asyncio.ensure_future(self.receive())
+
+    async def receive(self) -> None:
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            self.pending.pop(response['id']).set_result(response)
+
+    async def request(self, **request: Any) -> Dict[str, Any]:
+        self.next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self.pending[self.next_id] = future
+        self.writer.write(json.dumps({'id': self.next_id, **request}).encode() + b'\n')
+        await self.writer.drain()
+        response = await future
+        if not response['ok']:
+            raise RuntimeError(response['error'])
+        return response
+
+    async def close(self) -> None:
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.receiver.cancel()
+
+
+async def play(client: Client, args: argparse.Namespace, deadline: float, latencies: List[float], seed: int) -> int:
+    """
+    Plays random moves against the server's bot in consecutive games until deadline, returns games played
+    """
+    rng = np.random.default_rng(seed)
+    games = 0
+    while time.perf_counter() < deadline:
+        state = await client.request(op='new', m=args.m, n=args.n, k=args.k, bot='O')
+        while not state['end'] and time.perf_counter() < deadline:
+            board = np.array([list(row) for row in state['board']])
+            rows, cols = np.nonzero(board == '.')
+            i = rng.integers(len(rows))
+            start = time.perf_counter()
+            state = await client.request(op='move', session=state['session'], row=int(rows[i]), col=int(cols[i]))
+            latencies.append(time.perf_counter() - start)
+        await client.request(op='close', session=state['session'])
+        games += 1
+    return games
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    server: Optional[GameServer] = None
+    if args.spawn:
+        server = GameServer(args.workers, time_budget=args.time_budget if args.time_budget > 0 else None)
+        if args.unix is not None:
+            await server.start_unix(args.unix)
+        else:
+            await server.start_tcp(args.host, args.port)
+    try:
+        clients: List[Client] = []
+        for _ in range(args.connections):
+            if args.unix is not None:
+                reader, writer = await asyncio.open_unix_connection(args.unix)
+            else:
+                reader, writer = await asyncio.open_connection(args.host, args.port)
+            clients.append(Client(reader, writer))
+
+        latencies: List[float] = []
+        start = time.perf_counter()
+        deadline = start + args.duration
+        games = await asyncio.gather(*[play(clients[i % len(clients)], args, deadline, latencies, i)
+                                       for i in range(args.sessions)])
+        seconds = time.perf_counter() - start
+        for client in clients:
+            await client.close()
+    finally:
+        if server is not None:
+            await server.close()
+
+    ms = np.array(latencies) * 1e3
+    return {
+        'sessions': args.sessions,
+        'connections': args.connections,
+        'seconds': seconds,
+        'games': int(sum(games)),
+        'moves': len(latencies),
+        # every move request is answered after the bot's reply
+        'moves_per_sec': len(latencies) / seconds,
+        'latency_p50_ms': float(np.percentile(ms, 50)) if len(ms) else 0.0,
+        'latency_p99_ms': float(np.percentile(ms, 99)) if len(ms) else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Load test of m,n,k-game server: random moves against the bot')
+    parser.add_argument("--host", help="TCP host", type=str, default='127.0.0.1')
+    parser.add_argument("-p", "--port", help="TCP port", type=int, default=8765)
+    parser.add_argument("-u", "--unix", help="Unix socket path instead of TCP", type=str)
+    parser.add_argument("-s", "--sessions", help="Concurrent games", type=int, default=100)
+    parser.add_argument("-c", "--connections", help="Connections shared by sessions", type=int, default=10)
+    parser.add_argument("-d", "--duration", help="Seconds to run", type=float, default=10.0)
+    parser.add_argument("-m", help="Board width, 0 for infinite board", type=int, default=15)
+    parser.add_argument("-n", help="Board height, 0 for infinite board", type=int, default=15)
+    parser.add_argument("-k", help="Win row", type=int, default=5)
+    parser.add_argument("--spawn", help="Run the server in this process", action='store_true')
+    parser.add_argument("-w", "--workers", help="Bot worker processes of spawned server", type=int, default=2)
+    parser.add_argument("-t", "--time_budget", help="Bot's time per move of spawned server, 0 to evaluate all cells", type=float, default=0.1)
+    args = parser.parse_args()
+    args.m = args.m or None
+    args.n = args.n or None
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=1))
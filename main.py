@@ -4,10 +4,14 @@ from ConsoleView import ConsoleView
 from ConsoleHumanAgent import ConsoleHumanAgent
 from QLearningApproximationAgent import QLearningApproximationAgent
 from EpsilonGreedyPolicy import EpsilonGreedyPolicy
-from NumRowsFeatures import NumRowsFeatures
+from DeltaNumRowsFeatures import DeltaNumRowsFeatures
 from CartNumRowsFeatures import CartNumRowsFeatures
 #import logging
+from ParallelTrainer import ParallelTrainer
+from GameRecordLog import GameRecordWriter
+from Profiler import profiler
 from tqdm import tqdm
+import time
 import argparse
 from typing import Optional, IO
 
@@ -16,32 +20,68 @@ if __name__ == "__main__":
     #logging.basicConfig(filename='debug.log', filemode='w', level=logging.DEBUG, format='%(asctime)s %(message)s')
     parser = argparse.ArgumentParser(description='m,n,k-game')
     parser.add_argument("-l", "--log_file", help="Specify log file", type=str)
+    parser.add_argument("-r", "--record_log", help="Specify directory of binary game record log", type=str)
     parser.add_argument("-g", "--games_count", help="Number of games", type=int)
+    parser.add_argument("-p", "--profile_file", help="Dump per-phase timings to JSON lines (or CSV if name ends with .csv), single worker only", type=str)
+    parser.add_argument("--profile_every", help="Dump timings every N games", type=int, default=1)
+    parser.add_argument("-w", "--workers", help="Number of self-play processes", type=int, default=1)
     args = parser.parse_args()
+    if args.profile_file is not None and args.workers > 1:
+        # profiler counters live in the worker processes
+        parser.error('-p/--profile_file is not supported with more than one worker')
     log_filename = args.log_file
     log_file: Optional[IO] = None
-    if log_filename is not None:
+    if log_filename is not None and args.workers == 1:
         log_file = open(log_filename, 'w')
         title = "game_no;turn;player;height;width;learn_params;row;column\n"
         log_file.write(title)
 
+    record_log: Optional[GameRecordWriter] = None
+
+    profile_file: Optional[IO] = None
+    if args.profile_file is not None:
+        profiler.enabled = True
+        profile_file = open(args.profile_file, 'w')
+
     games_cnt = 1
     if args.games_count is not None:
         games_cnt = args.games_count
 
     try:
         max_row = 5
-        feat_model = NumRowsFeatures(row=5)
+        feat_model = DeltaNumRowsFeatures(row=5)
         #feat_model = CartNumRowsFeatures(row=5)
         num_feat = feat_model.features_count() + 1
         theta = np.zeros(num_feat)
-        for i in tqdm(range(games_cnt)):
-            print(f'Game {i}')
-            print(f'Theta1 {theta}')
+        if args.record_log is not None and args.workers == 1:
+            record_log = GameRecordWriter(args.record_log, num_feat)
+        if args.workers > 1:
+            # every worker writes its own logs: log_file.<worker>, record_log.<worker>
+            trainer = ParallelTrainer(args.workers, feat_model, theta=theta, row=max_row, log_filename=log_filename, record_dir=args.record_log)
+            start = time.time()
+            stats = trainer.train(games_cnt)
+            for s in stats:
+                print(f'Worker {s.worker}: {s.games} games, {s.games_per_sec:.2f} games/sec')
+            print(f'Total: {games_cnt / (time.time() - start):.2f} games/sec')
+            print(f'Theta {trainer.theta}')
+        else:
+            for i in tqdm(range(games_cnt)):
+                print(f'Game {i}')
+                print(f'Theta1 {theta}')
             
-            agent1 = QLearningApproximationAgent(0.5, 0.5, EpsilonGreedyPolicy(0.05), theta=theta, features_model=feat_model, inf_field=True)
-            agent2 = QLearningApproximationAgent(0.5, 0.5, EpsilonGreedyPolicy(0.05), theta=theta, features_model=feat_model, inf_field=True)
-            g = Game(player1=agent1, player2=agent2, view=None, m=None, n=None, log_file=log_file, game_no=i)
+                agent1 = QLearningApproximationAgent(0.5, 0.5, EpsilonGreedyPolicy(0.05), theta=theta, features_model=feat_model, inf_field=True, history='last')
+                agent2 = QLearningApproximationAgent(0.5, 0.5, EpsilonGreedyPolicy(0.05), theta=theta, features_model=feat_model, inf_field=True, history='last')
+                g = Game(player1=agent1, player2=agent2, view=None, m=None, n=None, log_file=log_file, game_no=i, record_log=record_log)
+                if profile_file is not None and (i + 1) % args.profile_every == 0:
+                    if args.profile_file.endswith('.csv'):
+                        profiler.dump_csv(profile_file, last_game=i)
+                    else:
+                        profiler.dump_json(profile_file, last_game=i, games=args.profile_every)
+                    profiler.reset()
     finally:
         if log_file is not None:
             log_file.close()
+        if record_log is not None:
+            record_log.close()
+        if profile_file is not None:
+            profile_file.close()
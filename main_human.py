@@ -17,6 +17,7 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='m,n,k-game')
     parser.add_argument("-l", "--log_file", help="Specify log file", type=str)
     parser.add_argument("-g", "--games_count", help="Number of games", type=int)
+    parser.add_argument("-t", "--time_budget", help="Bot's time per move in seconds, 0 to evaluate all cells", type=float, default=1.0)
     args = parser.parse_args()
     log_filename = args.log_file
     log_file: Optional[IO] = None
@@ -40,8 +41,10 @@ if __name__ == "__main__":
             print(f'Theta1 {theta}')
             
             human = ConsoleHumanAgent()
-            agent = QLearningApproximationAgent(0.5, 0.5, EpsilonGreedyPolicy(0), theta=theta, features_model=feat_model, inf_field=True)
-            g = Game(player1=agent, player2=human, view=ConsoleView(), m=None, n=None, log_file=log_file, game_no=i)
+            time_budget = args.time_budget if args.time_budget > 0 else None
+            agent = QLearningApproximationAgent(0.5, 0.5, EpsilonGreedyPolicy(0), theta=theta, features_model=feat_model, inf_field=True, time_budget=time_budget, frontier_candidates=True)
+            view = ConsoleView(info=lambda: f'Bot evaluated {agent.last_evaluated} of {agent.last_candidates} cells')
+            g = Game(player1=agent, player2=human, view=view, m=None, n=None, log_file=log_file, game_no=i)
     finally:
         if log_file is not None:
             log_file.close()
@@ -0,0 +1,30 @@
+from BatchGame import BatchGame
+from Game import Game
+from ConsoleHumanAgent import ConsoleHumanAgent
+from base import Action, Mark
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize('m, n, k', [(3, 3, 3), (6, 4, 3), (7, 7, 4), (9, 8, 5), (15, 15, 5)])
+def test_same_outcomes_as_game(m, n, k):
+    batch_size = 32
+    rng = np.random.default_rng(m * n + k)
+    # every game gets a random order of all cells, moves after its end are ignored
+    sequences = np.array([rng.permutation(m * n) for _ in range(batch_size)])
+
+    batch = BatchGame(batch_size, m, n, k)
+    for turn in range(m * n):
+        if batch.end_game.all():
+            break
+        batch.step(sequences[:, turn] // m, sequences[:, turn] % m)
+    assert batch.end_game.all()
+
+    for i, sequence in enumerate(sequences):
+        g = Game(ConsoleHumanAgent(), ConsoleHumanAgent(), m=m, n=n, k=k, play=False)
+        for cell in sequence:
+            g.push(Action(int(cell // m), int(cell % m)))
+            if g.end_game:
+                break
+        assert g.winner.value == batch.winner[i]
+        assert g.turn_no == batch.turn_no[i]
@@ -0,0 +1,22 @@
+from QLearningApproximationAgent import QLearningApproximationAgent
+from EpsilonGreedyPolicy import EpsilonGreedyPolicy
+from NumRowsFeatures import NumRowsFeatures
+from LRUCache import LRUCache
+from ConsoleHumanAgent import ConsoleHumanAgent
+from Game import Game
+from base import Action
+import numpy as np
+
+
+def test_shared_features_cache_keeps_models_apart():
+    g = Game(ConsoleHumanAgent(), ConsoleHumanAgent(), m=9, n=9, play=False)
+    for move in [(4, 4), (4, 5), (3, 3), (5, 5), (2, 2)]:
+        g.push(Action(*move))
+    state = g.new_state()
+    cache = LRUCache(10000)
+    for k in [5, 4, 5]:
+        fm = NumRowsFeatures(k)
+        agent = QLearningApproximationAgent(0.5, 0.5, EpsilonGreedyPolicy(0), fm, row=k, features_cache=cache,
+                                            theta=np.zeros(fm.features_count() + 1))
+        actions = agent.evaluate_actions(state)
+        assert np.array_equal(actions.features[:, 1:], fm.get_features_batch(state, actions.rows, actions.cols))
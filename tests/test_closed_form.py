@@ -0,0 +1,30 @@
+from QLearningApproximationAgent import QLearningApproximationAgent
+from EpsilonGreedyPolicy import EpsilonGreedyPolicy
+from CartNumRowsFeatures import CartNumRowsFeatures
+import numpy as np
+import pytest
+
+
+def inverse_formula(X: np.ndarray, reg: float) -> np.ndarray:
+    # the formula of learn() before the closed form: X.T X of 1-D X is the scalar X.X
+    return np.dot(np.linalg.inv(np.dot(X.T, X) + reg * np.identity(len(X.T))), X.T).T
+
+
+@pytest.mark.parametrize('reg', [0.1, 1, 1000])
+def test_regularized_direction_matches_inverse(reg):
+    fm = CartNumRowsFeatures(5)
+    agent = QLearningApproximationAgent(0.5, 0.5, EpsilonGreedyPolicy(0.05), fm, reg=reg)
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        X = np.insert(rng.integers(0, 5, fm.features_count()), 0, 1).astype(float)
+        assert np.allclose(agent.regularized_direction(X), inverse_formula(X, reg), rtol=1e-6, atol=1e-9)
+        assert np.allclose(agent.regularized_direction_inv(X), inverse_formula(X, reg))
+
+
+@pytest.mark.parametrize('size', [1, 3, 17, 60])
+def test_regularized_direction_random_vectors(size):
+    agent = QLearningApproximationAgent(0.5, 0.5, EpsilonGreedyPolicy(0.05), CartNumRowsFeatures(5), reg=2.5)
+    rng = np.random.default_rng(size)
+    for _ in range(20):
+        X = rng.normal(size=size)
+        assert np.allclose(agent.regularized_direction(X), inverse_formula(X, agent.reg), rtol=1e-6, atol=1e-9)
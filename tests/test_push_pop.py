@@ -0,0 +1,65 @@
+from Game import Game
+from ConsoleHumanAgent import ConsoleHumanAgent
+from FrontierIndex import FrontierIndex
+from base import Action, near_cells
+import numpy as np
+import pytest
+
+
+def snapshot(g: Game):
+    """
+    Everything push() changes and pop() must take back
+    """
+    frontier = g.frontier
+    return (g.board.copy(), g.grid.geometry(), g.hash, g.current_player.mark, g.winner, g.end_game, g.turn_no,
+            dict(frontier.stones), dict(frontier.near), dict(frontier.adjacent), set(frontier.frontier),
+            frontier.alone_count, g.bitboard.to_array())
+
+
+def assert_same(before, after):
+    for b, a in zip(before, after):
+        if isinstance(b, np.ndarray):
+            assert np.array_equal(b, a)
+        else:
+            assert b == a
+
+
+@pytest.mark.parametrize('k', [3, 4, 5])
+def test_push_pop_round_trip_on_infinite_board(k):
+    rng = np.random.default_rng(k)
+    extended = False
+    for _ in range(10):
+        g = Game(ConsoleHumanAgent(), ConsoleHumanAgent(), m=None, n=None, k=k, play=False, win_check='bitboard')
+        snapshots = []
+        while not g.end_game:
+            # radius 2 reaches the edge of the board, such moves extend it
+            rows, cols = near_cells(g.board, 2)
+            i = rng.integers(len(rows))
+            snapshots.append(snapshot(g))
+            g.push(Action(int(rows[i]), int(cols[i])))
+            extended |= g.board.shape != snapshots[-1][0].shape
+
+            # the incremental state agrees with the one computed from scratch
+            assert g.hash == g.zobrist.hash_board(g.board, g.current_player.mark, g.grid.origin)
+            assert np.array_equal(g.bitboard.to_array(), g.board)
+            index = FrontierIndex.from_board(g.board, g.grid.origin, g.frontier.radius)
+            assert g.frontier.frontier == index.frontier
+            assert g.frontier.alone_count == index.alone_count
+
+        while snapshots:
+            g.pop()
+            assert_same(snapshots.pop(), snapshot(g))
+            assert g.hash == g.zobrist.hash_board(g.board, g.current_player.mark, g.grid.origin)
+        assert not g.undo
+    assert extended
+
+
+def test_new_state_keeps_its_frontier():
+    g = Game(ConsoleHumanAgent(), ConsoleHumanAgent(), m=None, n=None, k=5, play=False)
+    state = g.new_state()
+    frontier = set(state.frontier.frontier)
+    rows, cols = near_cells(g.board, 1)
+    g.push(Action(int(rows[0]), int(cols[0])))
+    assert state.frontier.frontier == frontier
+    assert state.frontier.frontier == FrontierIndex.from_board(state.board, state.origin, g.frontier.radius).frontier
+    assert g.state_view().frontier is g.frontier
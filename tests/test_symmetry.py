@@ -0,0 +1,80 @@
+from SymmetricNumRowsFeatures import SymmetricNumRowsFeatures
+from NumRowsFeatures import NumRowsFeatures
+from BoardSymmetry import BoardSymmetry
+from QLearningApproximationAgent import QLearningApproximationAgent
+from EpsilonGreedyPolicy import EpsilonGreedyPolicy
+from LRUCache import LRUCache
+from Game import Game
+from base import GameState, Mark
+import numpy as np
+import pytest
+
+
+def random_board(rng: np.random.Generator, shape) -> np.ndarray:
+    return np.where(rng.random(shape) < 0.4, rng.integers(1, 3, shape), 0).astype(np.int8)
+
+
+@pytest.mark.parametrize('shape', [(5, 5), (6, 4), (9, 9)])
+def test_canonical_stack_matches_canonical(shape):
+    symmetry = BoardSymmetry()
+    boards = np.array([random_board(np.random.default_rng(i), shape) for i in range(30)])
+    canonical, transforms = symmetry.canonical_stack(boards)
+    for board, c, t in zip(boards, canonical, transforms):
+        expected, expected_t = symmetry.canonical(board)
+        assert np.array_equal(c, expected) and t == expected_t
+
+
+@pytest.mark.parametrize('shape', [(5, 5), (6, 4), (9, 9)])
+def test_features_invariant_under_transforms(shape):
+    symmetry = BoardSymmetry()
+    fm = SymmetricNumRowsFeatures(4)
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        board = random_board(rng, shape)
+        expected = fm.get_features(GameState(board, Mark.X, False, Mark.NO))
+        for t in symmetry.transforms(shape):
+            transformed = symmetry.apply(board, t)
+            assert np.array_equal(fm.get_features(GameState(transformed, Mark.X, False, Mark.NO)), expected)
+
+
+def test_canonical_cache_requires_symmetric_features():
+    with pytest.raises(ValueError):
+        QLearningApproximationAgent(0.5, 0.5, EpsilonGreedyPolicy(0), NumRowsFeatures(5), canonical_cache=True)
+
+
+class Recorder(QLearningApproximationAgent):
+    def get_action(self, state):
+        action = super().get_action(state)
+        self.record.append((tuple(action), self.last_batch.features.copy(), self.last_batch.Q.copy()))
+        return action
+
+    def evaluate_actions(self, state):
+        self.last_batch = super().evaluate_actions(state)
+        return self.last_batch
+
+
+def self_play(canonical_cache: bool, seed: int):
+    fm = SymmetricNumRowsFeatures(4)
+    theta = np.random.default_rng(1).normal(size=fm.features_count() + 1)
+    cache = LRUCache(100000)
+    agents = []
+    for i in range(2):
+        agent = Recorder(0.5, 0.5, EpsilonGreedyPolicy(0.2, seed=2 * seed + i), fm, row=4, theta=theta.copy(),
+                         features_cache=cache, canonical_cache=canonical_cache, history='last')
+        agent.record = []
+        agents.append(agent)
+    Game(agents[0], agents[1], m=6, n=6, k=4)
+    return agents, cache
+
+
+def test_canonical_cache_is_transparent():
+    for seed in range(3):
+        plain, _ = self_play(False, seed)
+        canonical, cache = self_play(True, seed)
+        for a, b in zip(plain, canonical):
+            assert len(a.record) == len(b.record)
+            for (move_a, X_a, Q_a), (move_b, X_b, Q_b) in zip(a.record, b.record):
+                assert move_a == move_b
+                assert np.array_equal(X_a, X_b)
+                assert np.allclose(Q_a, Q_b)
+            assert np.array_equal(a.theta, b.theta)
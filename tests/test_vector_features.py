@@ -0,0 +1,32 @@
+from NumRowsFeatures import NumRowsFeatures
+from VectorNumRowsFeatures import VectorNumRowsFeatures
+from base import GameState, Mark
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize('k', [3, 4, 5, 6])
+def test_matches_loop_implementation(k):
+    rng = np.random.default_rng(k)
+    loops = NumRowsFeatures(k)
+    vector = VectorNumRowsFeatures(k)
+    for _ in range(300):
+        h, w = rng.integers(1, 16, 2)
+        density = rng.random()
+        board = np.where(rng.random((h, w)) < density, rng.integers(1, 3, (h, w)), 0).astype(np.int8)
+        player = Mark.X if rng.random() < 0.5 else Mark.O
+        state = GameState(board, player, False, Mark.NO)
+        assert np.array_equal(loops.get_features(state), vector.get_features(state)), (board, player)
+        rows, cols = np.nonzero(board == Mark.NO.value)
+        if len(rows) > 0:
+            assert np.array_equal(loops.get_features_batch(state, rows, cols),
+                                  vector.get_features_batch(state, rows, cols)), (board, player)
+
+
+def test_batch_larger_than_chunk():
+    rng = np.random.default_rng(0)
+    board = np.where(rng.random((19, 19)) < 0.3, rng.integers(1, 3, (19, 19)), 0).astype(np.int8)
+    state = GameState(board, Mark.O, False, Mark.NO)
+    rows, cols = np.nonzero(board == Mark.NO.value)
+    assert np.array_equal(NumRowsFeatures(5).get_features_batch(state, rows, cols),
+                          VectorNumRowsFeatures(5, chunk=16).get_features_batch(state, rows, cols))
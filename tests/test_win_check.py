@@ -0,0 +1,32 @@
+from Game import Game
+from ConsoleHumanAgent import ConsoleHumanAgent
+from base import Action, Mark, near_cells
+import numpy as np
+import pytest
+
+
+def play_random(g: Game, rng: np.random.Generator):
+    """
+    Seeded random game by push(), moves near the stones; yields the winner and the move after every push
+    """
+    while not g.end_game:
+        rows, cols = near_cells(g.board, 1)
+        i = rng.integers(len(rows))
+        winner = g.push(Action(int(rows[i]), int(cols[i])))
+        row, col = g.undo[-1][:2]
+        yield winner, row + g.grid.origin_row, col + g.grid.origin_col
+
+
+@pytest.mark.parametrize('k', [3, 4, 5])
+@pytest.mark.parametrize('m, n', [(7, 7), (10, 8), (None, None)])
+def test_win_checks_agree(m, n, k):
+    rng = np.random.default_rng(k)
+    for _ in range(10):
+        g = Game(ConsoleHumanAgent(), ConsoleHumanAgent(), m=m, n=n, k=k, play=False, win_check='bitboard')
+        for winner, row, col in play_random(g, rng):
+            mark = g.board[row, col]
+            last_move = g.check_win_at(row, col) != Mark.NO
+            full = g.check_win() != Mark.NO
+            bitboard = g.bitboard.is_win(Mark(int(mark)))
+            assert last_move == full == bitboard == (winner != Mark.NO)
+        assert g.end_game